@@ -20,48 +20,152 @@
 
 '''A Python library of sorts for manipulating sound data.'''
 
+__version__ = '0.1.4'
+
+import collections
+import numpy
+import threading
+
 import noise
-from .sound import Clip
+from . import backends
+from . import features
+from . import instrument
+from .sound import Clip, MappedClip, StreamingClip, istft
+from .sound import default_dtype, set_default_dtype
 from .repertoire import Repertoire
-from .gammatone import Gammatone, Gammachirp
+from .gammatone import Gammatone, Gammachirp, GammatoneFilterbank, erb_space
+from .cache import DiskCache
+from .resampling import Resampler, resample, resample_blocks
+from .filters import Filter, filter_blocks
+from .featurefile import FeatureFile, FeatureWriter
+from .dataset import FeatureDataset, pack_clips
+from .spectrogram import StreamingSpectrogram
 
 
-def load_clip(filename, sample_rate=None, normalize=False):
-    '''Return a sound clip with some standard preprocessing applied.'''
-    clip = Clip(filename)
+def load_clip(filename, sample_rate=None, normalize=False, cache=None, method='auto',
+              dtype=None):
+    '''Return a sound clip with some standard preprocessing applied.
+
+    filename: The name of the sound file to load.
+    sample_rate: If given, resample the clip to this rate.
+    normalize: If True, normalize the samples in the clip.
+    cache: If given, a DiskCache to check for (and store) the preprocessed
+      clip.
+    method: The resampling method to use. See Clip.set_sample_rate.
+    dtype: The floating point type to decode and process samples in.
+      Defaults to default_dtype().
+    '''
+    dtype = default_dtype() if dtype is None else numpy.dtype(dtype)
+    params = dict(sample_rate=sample_rate,
+                  normalize=normalize,
+                  method=method,
+                  dtype=dtype.name,
+                  version=__version__)
+    if cache is not None:
+        clip = cache.get(filename, **params)
+        if clip is not None:
+            return clip
+    clip = Clip(filename, dtype=dtype)
     if sample_rate is not None:
-        while sample_rate < clip.nyquist / 2:
-            clip.lowpass_filter(clip.nyquist / 2)
-            clip.set_sample_rate(clip.nyquist)
-        if sample_rate < clip.sample_rate:
-            clip.lowpass_filter(sample_rate / 2)
-        clip.set_sample_rate(sample_rate)
+        clip.set_sample_rate(sample_rate, method)
     if normalize:
         clip.normalize()
+    if cache is not None:
+        cache.put(filename, clip, **params)
     return clip
 
 
-class CachedLoader(dict):
+class CachedLoader(object):
     '''Cache loaded sound clips in memory.
 
     To use, create an instance of this object and then call it like you would
-    call load_clip.
+    call load_clip. Clips are keyed on the filename and all preprocessing
+    parameters, and the least recently used clips are evicted once the
+    samples in the cache take up more than a maximum number of bytes.
+
+    A loader can be shared among threads. Concurrent requests for a clip that
+    is not yet cached wait for a single load of that clip to finish.
+
+    A loader is no longer a dict of clips keyed on filename; use len() and
+    stats() to inspect it.
     '''
 
-    def __init__(self, maxlen=256):
-        '''Initialize the cache with a maximum clip count.'''
-        import collections
-        self._maxlen = maxlen
-        self._lru = collections.deque(maxlen=maxlen)
-
-    def __call__(self, filename, sample_rate=None):
-        '''Retrieve a clip, either from memory or from disk.'''
-        if filename in self:
-            self._lru.remove(filename)
-        else:
-            clip = load_clip(filename, sample_rate)
-            if len(self._lru) == self._maxlen:
-                del self[self._lru[0]]
-            self[filename] = clip
-        self._lru.append(filename)
-        return self[filename]
+    def __init__(self, maxlen=256, max_bytes=1 << 30):
+        '''Initialize the cache.
+
+        maxlen: Evict clips when there are more than this many. None means
+          there is no limit on the number of clips.
+        max_bytes: Evict clips when their samples take up more than this many
+          bytes in total.
+        '''
+        self.max_bytes = max_bytes
+        self.maxlen = maxlen
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clips = collections.OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._clips)
+
+    def __contains__(self, key):
+        return key in self._clips
+
+    def __call__(self, filename, sample_rate=None, normalize=False, cache=None,
+                 dtype=None):
+        '''Retrieve a clip, either from memory or from disk.
+
+        Arguments are the same as for load_clip.
+        '''
+        dtype = default_dtype() if dtype is None else numpy.dtype(dtype)
+        key = (filename, sample_rate, normalize, dtype.name)
+        while True:
+            with self._lock:
+                if key in self._clips:
+                    self.hits += 1
+                    entry = self._clips[key] = self._clips.pop(key)
+                    return entry[0]
+                loading = key not in self._loading
+                if loading:
+                    self.misses += 1
+                    self._loading[key] = threading.Event()
+                done = self._loading[key]
+            if loading:
+                break
+            # another thread is loading this clip. if that load fails, the
+            # clip will still be missing and we will try to load it ourselves.
+            done.wait()
+        try:
+            clip = load_clip(filename, sample_rate, normalize, cache, dtype=dtype)
+            # remember the size of the clip as it was cached; callers share the
+            # clip, so its samples may later be replaced.
+            nbytes = clip.samples.nbytes
+            with self._lock:
+                self._clips[key] = (clip, nbytes)
+                self.nbytes += nbytes
+                self._evict()
+        finally:
+            with self._lock:
+                del self._loading[key]
+            done.set()
+        return clip
+
+    def _evict(self):
+        '''Remove least recently used clips until the cache fits its limits.'''
+        while self._clips and (self.nbytes > self.max_bytes or
+                               self.maxlen and len(self._clips) > self.maxlen):
+            _, (_, nbytes) = self._clips.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def stats(self):
+        '''Return a dictionary of cache statistics.'''
+        with self._lock:
+            return dict(clips=len(self._clips),
+                        nbytes=self.nbytes,
+                        hits=self.hits,
+                        misses=self.misses,
+                        evictions=self.evictions)
@@ -0,0 +1,320 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Pluggable backends for reading and writing sound files.
+
+A backend reads and writes some set of file formats. Backends are kept in a
+registry, in order of preference; to read or write a file, we use the first
+available backend that handles the file's extension, falling back to later
+backends if it cannot parse the file.
+
+Two backends are registered by default:
+
+- 'wave' reads uncompressed PCM and floating-point WAV files with a small
+  RIFF parser and numpy, and writes 16-bit PCM WAV files with the standard
+  library wave module. It has no dependencies beyond numpy.
+- 'audiolab' reads and writes anything libsndfile supports, using
+  scikits.audiolab, which is only imported when the backend is first used.
+
+Readers returned by backends have sample_rate, channels and nframes
+attributes, a read(n) method that returns the next n frames as a (frames,
+channels) array of floats in [-1, 1] (of the dtype passed to open), and a
+close() method.
+'''
+
+import os
+import wave
+import numpy
+import struct
+
+# numpy dtypes for the sample formats that can be mapped directly from a WAV
+# file, keyed on (format tag, bits per sample).
+_WAV_DTYPES = {
+    (1, 8): 'u1',
+    (1, 16): '<i2',
+    (1, 32): '<i4',
+    (3, 32): '<f4',
+    (3, 64): '<f8',
+    }
+
+
+def wav_layout(filename):
+    '''Locate the sample data in an uncompressed WAV file.
+
+    Returns a dictionary describing the sample rate, channel count, sample
+    dtype, byte offset and frame count of the data chunk in the file.
+    '''
+    with open(filename, 'rb') as handle:
+        header = handle.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+            raise ValueError('%s: not a RIFF WAVE file' % filename)
+        fmt = None
+        while True:
+            header = handle.read(8)
+            if len(header) < 8:
+                raise ValueError('%s: no data chunk' % filename)
+            chunk, length = struct.unpack('<4sI', header)
+            if chunk == b'data':
+                break
+            if chunk == b'fmt ':
+                body = handle.read(length)
+                if len(body) < 16:
+                    raise ValueError('%s: truncated fmt chunk' % filename)
+                fmt = struct.unpack_from('<HHIIHH', body)
+                if fmt[0] == 0xFFFE:
+                    if len(body) < 26:
+                        raise ValueError('%s: truncated fmt chunk' % filename)
+                    fmt = struct.unpack_from('<H', body, 24) + fmt[1:]
+                handle.seek(length & 1, 1)
+            else:
+                handle.seek(length + (length & 1), 1)
+        offset = handle.tell()
+    if fmt is None:
+        raise ValueError('%s: no fmt chunk before data' % filename)
+    tag, channels, sample_rate, _, align, bits = fmt
+    if not channels or not align:
+        raise ValueError('%s: invalid fmt chunk' % filename)
+    if (tag, bits) not in _WAV_DTYPES:
+        raise ValueError('%s: cannot map %d-bit samples with format tag %d' %
+                         (filename, bits, tag))
+    length = min(length, os.path.getsize(filename) - offset)
+    return dict(sample_rate=sample_rate,
+                channels=channels,
+                dtype=_WAV_DTYPES[tag, bits],
+                offset=offset,
+                nframes=length // align)
+
+
+def decode_pcm(raw, dtype=float, mono=False):
+    '''Convert an array of raw WAV samples to floating point in [-1, 1].
+
+    raw: An array of raw samples, with channels along the last axis.
+    dtype: The floating point type to convert samples to.
+    mono: If True, average the channels of each frame together.
+    '''
+    if mono:
+        samples = raw.mean(axis=-1, dtype=dtype)
+    else:
+        samples = raw.astype(dtype)
+    if raw.dtype.kind == 'u':
+        samples -= 128
+    if raw.dtype.kind in 'ui':
+        samples /= float(1 << (8 * raw.dtype.itemsize - 1))
+    return samples
+
+
+class Backend(object):
+    '''A backend reads and writes sound files in some set of formats.
+
+    Subclasses set name, extensions (an empty tuple means any extension) and
+    modules (the names of modules the backend needs), and implement open()
+    and write().
+    '''
+
+    name = None
+    extensions = ()
+    modules = ()
+
+    def __init__(self):
+        self._available = None
+
+    def available(self):
+        '''Return True if the modules this backend needs can be imported.'''
+        if self._available is None:
+            try:
+                [__import__(m) for m in self.modules]
+                self._available = True
+            except ImportError:
+                self._available = False
+        return self._available
+
+    def handles(self, filename):
+        '''Return True if this backend handles files with this name.'''
+        ext = os.path.splitext(filename)[1].lower()
+        return not self.extensions or ext in self.extensions
+
+    def open(self, filename, dtype=float):
+        '''Open a sound file for reading, returning a reader.
+
+        filename: The name of the file to open.
+        dtype: The floating point type that the reader decodes samples to.
+        '''
+        raise NotImplementedError
+
+    def write(self, filename, samples, sample_rate):
+        '''Write a 1-dimensional array of samples to a sound file.'''
+        raise NotImplementedError
+
+
+class _WaveReader(object):
+    '''Read blocks of frames from an uncompressed WAV file.'''
+
+    def __init__(self, filename, dtype):
+        layout = wav_layout(filename)
+        self.sample_rate = layout['sample_rate']
+        self.channels = layout['channels']
+        self.nframes = layout['nframes']
+        self._raw_dtype = numpy.dtype(layout['dtype'])
+        self._dtype = dtype
+        self._remaining = self.nframes
+        self._handle = open(filename, 'rb')
+        self._handle.seek(layout['offset'])
+
+    def read(self, n):
+        n = min(n, self._remaining)
+        raw = numpy.fromfile(self._handle, self._raw_dtype, n * self.channels)
+        self._remaining -= len(raw) // self.channels
+        return decode_pcm(raw.reshape((-1, self.channels)), self._dtype)
+
+    def close(self):
+        self._handle.close()
+
+
+class WaveBackend(Backend):
+    '''Read PCM and float WAV files, and write 16-bit PCM WAV files.'''
+
+    name = 'wave'
+    extensions = ('.wav', '.wave')
+
+    def open(self, filename, dtype=float):
+        return _WaveReader(filename, dtype)
+
+    def write(self, filename, samples, sample_rate):
+        pcm = (numpy.clip(samples, -1, 1) * 32767).astype('<i2')
+        handle = wave.open(filename, 'wb')
+        try:
+            handle.setnchannels(1)
+            handle.setsampwidth(2)
+            handle.setframerate(int(sample_rate))
+            handle.writeframes(pcm.tobytes())
+        finally:
+            handle.close()
+
+
+class _AudiolabReader(object):
+    '''Read blocks of frames from any file that libsndfile supports.'''
+
+    def __init__(self, filename, dtype):
+        import scikits.audiolab
+        self._snd = scikits.audiolab.Sndfile(filename)
+        self._dtype = dtype
+        self.sample_rate = self._snd.samplerate
+        self.channels = self._snd.channels
+        self.nframes = self._snd.nframes
+        self._remaining = self.nframes
+
+    def read(self, n):
+        n = min(n, self._remaining)
+        self._remaining -= n
+        frames = self._snd.read_frames(n, dtype=self._dtype)
+        return frames.reshape((n, self.channels))
+
+    def close(self):
+        self._snd.close()
+
+
+class AudiolabBackend(Backend):
+    '''Read and write sound files using scikits.audiolab.'''
+
+    name = 'audiolab'
+    modules = ('scikits.audiolab', )
+
+    def open(self, filename, dtype=float):
+        return _AudiolabReader(filename, dtype)
+
+    def write(self, filename, samples, sample_rate):
+        import scikits.audiolab
+        snd = scikits.audiolab.Sndfile(
+            filename, 'w', scikits.audiolab.Format('wav'), 1, sample_rate)
+        snd.write_frames(samples)
+        snd.close()
+
+
+_BACKENDS = []
+
+
+def register(backend, first=False):
+    '''Add a backend to the registry.
+
+    backend: A Backend instance.
+    first: If True, prefer this backend over those already registered.
+      Otherwise it is used only for files that earlier backends cannot handle.
+    '''
+    unregister(backend.name)
+    if first:
+        _BACKENDS.insert(0, backend)
+    else:
+        _BACKENDS.append(backend)
+    return backend
+
+
+def unregister(name):
+    '''Remove the backend with the given name from the registry, if present.'''
+    _BACKENDS[:] = [b for b in _BACKENDS if b.name != name]
+
+
+def names():
+    '''Get the names of the available backends, in order of preference.'''
+    return [b.name for b in _BACKENDS if b.available()]
+
+
+def _candidates(filename, backend):
+    found = [b for b in _BACKENDS
+             if (backend is None or b.name == backend)
+             and b.handles(filename) and b.available()]
+    if not found:
+        raise IOError('%s: no %s backend is available' % (
+            filename, backend or 'sound file'))
+    return found
+
+
+def open_file(filename, backend=None, dtype=float):
+    '''Open a sound file for reading.
+
+    filename: The name of the file to open.
+    backend: The name of the backend to use. Defaults to the first available
+      backend that can read the file.
+    dtype: The floating point type that the reader decodes samples to.
+
+    Returns a reader.
+    '''
+    errors = []
+    for b in _candidates(filename, backend):
+        try:
+            return b.open(filename, dtype)
+        except (ValueError, EOFError, struct.error, wave.Error) as e:
+            errors.append('%s: %s' % (b.name, e))
+    raise IOError('%s: cannot read (%s)' % (filename, '; '.join(errors)))
+
+
+def write_file(filename, samples, sample_rate, backend=None):
+    '''Write a 1-dimensional array of samples to a sound file.
+
+    filename: The name of the file to write.
+    samples: The samples to write, in [-1, 1].
+    sample_rate: The sample rate of the samples, in Hz.
+    backend: The name of the backend to use. Defaults to the first available
+      backend that handles the file's extension.
+    '''
+    _candidates(filename, backend)[0].write(filename, samples, sample_rate)
+
+
+register(WaveBackend())
+register(AudiolabBackend())
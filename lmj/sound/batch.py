@@ -0,0 +1,396 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Process a corpus of sound files in parallel.
+
+A pipeline is a picklable callable that takes a filename and returns a value.
+process() runs a pipeline over many files in a pool of worker processes, and
+generates a Result for each file as it finishes. Failures are captured per
+file, so one corrupt file does not stop the run.
+
+A Prefetcher runs a pipeline on a pool of threads in the calling process, a
+few files ahead of the code that consumes the results, so that decoding and
+disk reads overlap with whatever the consumer does with each clip.
+'''
+
+import collections
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import threading
+import time
+import traceback
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from . import load_clip
+
+Result = collections.namedtuple('Result', 'filename value error seconds')
+
+
+class Pipeline(object):
+    '''Load a clip, then pass it through a sequence of steps.
+
+    Each step is a picklable callable (e.g. a module-level function) that
+    takes the output of the previous step. The first step gets the loaded
+    sound.Clip.
+    '''
+
+    def __init__(self, sample_rate=None, normalize=False, steps=(), cache=None,
+                 dtype=None):
+        '''Initialize the pipeline.
+
+        sample_rate: If given, resample clips to this rate when loading.
+        normalize: If True, normalize clips when loading.
+        steps: A sequence of callables to apply to each loaded clip.
+        cache: If given, a DiskCache for preprocessed clips.
+        dtype: The floating point type to load clips in. Defaults to the
+          default dtype in each worker process.
+        '''
+        self.sample_rate = sample_rate
+        self.normalize = normalize
+        self.steps = list(steps)
+        self.cache = cache
+        self.dtype = dtype
+
+    def __call__(self, filename):
+        value = load_clip(filename, self.sample_rate, self.normalize, self.cache,
+                          dtype=self.dtype)
+        for step in self.steps:
+            value = step(value)
+        return value
+
+
+class SaveClip(object):
+    '''A pipeline step that saves a clip to a directory.'''
+
+    def __init__(self, directory):
+        '''Save clips to files with the same basename in this directory.'''
+        self.directory = directory
+
+    def __call__(self, clip):
+        filename = os.path.join(self.directory, os.path.basename(clip.filename))
+        clip.save(filename)
+        return filename
+
+
+class _Budget(object):
+    '''Limit the estimated bytes of sound held by tasks that are in flight.
+
+    A task is admitted when it fits within the budget, or when fewer than a
+    minimum number of tasks are in flight (so that a chunk of tasks can
+    always be filled and large files still make progress).
+    '''
+
+    def __init__(self, max_bytes, min_tasks):
+        self.max_bytes = max_bytes
+        self.min_tasks = min_tasks
+        self.nbytes = 0
+        self.tasks = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes):
+        with self._cond:
+            while (self.max_bytes is not None and
+                   self.tasks >= self.min_tasks and
+                   self.nbytes + nbytes > self.max_bytes):
+                self._cond.wait()
+            self.nbytes += nbytes
+            self.tasks += 1
+
+    def release(self, nbytes):
+        with self._cond:
+            self.nbytes -= nbytes
+            self.tasks -= 1
+            self._cond.notify_all()
+
+
+class Progress(object):
+    '''Track and periodically log the throughput of a batch run.'''
+
+    def __init__(self, total, report_every=10.):
+        '''Initialize progress tracking.
+
+        total: The number of files in the run.
+        report_every: Log progress at most once every this many seconds.
+        '''
+        self.total = total
+        self.report_every = report_every
+        self.done = 0
+        self.failed = 0
+        self.nbytes = 0
+        self.start = self._last = time.time()
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    @property
+    def rate(self):
+        '''The number of files finished per second.'''
+        return self.done / max(1e-9, self.elapsed)
+
+    @property
+    def eta(self):
+        '''The estimated number of seconds until the run is finished.'''
+        return (self.total - self.done) / max(1e-9, self.rate)
+
+    def update(self, result, nbytes=0):
+        '''Record a finished file, logging progress if it is time to.'''
+        self.done += 1
+        self.nbytes += nbytes
+        if result.error is not None:
+            self.failed += 1
+        now = time.time()
+        if now - self._last >= self.report_every or self.done == self.total:
+            self._last = now
+            logging.info('%d/%d files (%d failed), %.1f files/s, %.1f MB/s, '
+                         'eta %ds', self.done, self.total, self.failed,
+                         self.rate, self.nbytes / 1e6 / max(1e-9, self.elapsed),
+                         self.eta)
+
+
+_pipeline = None
+
+
+def _init(pipeline):
+    global _pipeline
+    _pipeline = pipeline
+
+
+def _call(pipeline, filename):
+    start = time.time()
+    try:
+        return Result(filename, pipeline(filename), None, time.time() - start)
+    except Exception:
+        return Result(filename, None, traceback.format_exc(), time.time() - start)
+
+
+def _run(filename):
+    return _call(_pipeline, filename)
+
+
+def _file_bytes(filename):
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def process(filenames, pipeline, processes=None, chunksize=1, max_bytes=None,
+            expansion=4., report_every=10.):
+    '''Run a pipeline over many files in a pool of worker processes.
+
+    filenames: A sequence of sound filenames to process.
+    pipeline: A picklable callable that takes a filename, e.g. a Pipeline.
+    processes: The number of worker processes. Defaults to the CPU count.
+    chunksize: Send this many files to a worker at a time.
+    max_bytes: If given, stop handing out files when the estimated memory
+      held by files in flight would exceed this many bytes.
+    expansion: Estimate the memory needed for a file as this multiple of its
+      size on disk. The default suits 16-bit PCM decoded to float64.
+    report_every: Log throughput and ETA at most once every this many seconds.
+
+    Generates a Result(filename, value, error, seconds) for each file, in the
+    order that files finish. error is None, or a formatted traceback if the
+    pipeline raised an exception for that file.
+    '''
+    filenames = list(filenames)
+    budget = _Budget(max_bytes, chunksize)
+    progress = Progress(len(filenames), report_every)
+
+    # the sizes of files in flight, as they were when the files were admitted.
+    # admit() runs in a pool thread, so access is locked.
+    admitted = collections.defaultdict(collections.deque)
+    lock = threading.Lock()
+
+    def admit():
+        for filename in filenames:
+            nbytes = _file_bytes(filename)
+            budget.acquire(expansion * nbytes)
+            with lock:
+                admitted[filename].append(nbytes)
+            yield filename
+
+    pool = multiprocessing.Pool(processes, _init, (pipeline, ))
+    try:
+        for result in pool.imap_unordered(_run, admit(), chunksize):
+            with lock:
+                sizes = admitted[result.filename]
+                nbytes = sizes.popleft()
+                if not sizes:
+                    del admitted[result.filename]
+            budget.release(expansion * nbytes)
+            if result.error is not None:
+                logging.error('%s: failed\n%s', result.filename, result.error)
+            progress.update(result, nbytes)
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class Prefetcher(object):
+    '''Load clips on a pool of threads, ahead of the code that uses them.
+
+    Iterate over a prefetcher to get a Result(filename, value, error,
+    seconds) for each file. Files are submitted to the pool as results are
+    consumed, so at most a fixed number of files (and, optionally, an
+    estimated number of bytes) are loaded but not yet consumed at any time.
+
+    numpy, scipy and file reads release the GIL for most of the work of
+    loading a clip, so threads overlap well with each other and with the
+    consumer, and clips do not need to be pickled between processes.
+
+    A prefetcher is also an asynchronous iterator: in a coroutine, use
+    "async for result in prefetcher". Each step waits for the next result in
+    the event loop's default executor, so the loop is never blocked.
+    '''
+
+    def __init__(self, filenames, pipeline=None, threads=4, ahead=8,
+                 max_bytes=None, expansion=4., ordered=True):
+        '''Start loading files.
+
+        filenames: An iterable of sound filenames to load.
+        pipeline: A callable that takes a filename, e.g. a Pipeline. Defaults
+          to loading each clip with default settings.
+        threads: The number of loader threads.
+        ahead: Load at most this many files ahead of the consumer.
+        max_bytes: If given, also stop loading ahead when the estimated memory
+          held by files loaded ahead would exceed this many bytes. A file
+          larger than this is still loaded, on its own.
+        expansion: Estimate the memory needed for a file as this multiple of
+          its size on disk.
+        ordered: If True, generate results in the order of the filenames.
+          Otherwise, generate results as soon as they are ready.
+        '''
+        self.pipeline = pipeline or Pipeline()
+        self.ahead = max(1, ahead)
+        self.max_bytes = max_bytes
+        self.expansion = expansion
+        self.ordered = ordered
+        self.nbytes = 0
+        self._filenames = iter(filenames)
+        self._held = None
+        self._pending = collections.deque()
+        self._ready = queue.Queue()
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.pool.ThreadPool(threads)
+        self._fill()
+
+    def _fill(self):
+        '''Submit files to the pool until the read-ahead limits are reached.
+
+        A file that would take the files in flight over max_bytes is held
+        back until enough results have been consumed, unless nothing else is
+        in flight.
+        '''
+        while len(self._pending) < self.ahead:
+            if self._held is None:
+                if self._filenames is None:
+                    return
+                try:
+                    filename = next(self._filenames)
+                except StopIteration:
+                    self._filenames = None
+                    return
+                self._held = (filename, self.expansion * _file_bytes(filename))
+            filename, nbytes = self._held
+            if (self.max_bytes is not None and self._pending and
+                    self.nbytes + nbytes > self.max_bytes):
+                return
+            self._held = None
+            self.nbytes += nbytes
+            callback = None if self.ordered else self._ready.put
+            self._pending.append((filename, nbytes, self._pool.apply_async(
+                _call, (self.pipeline, filename), callback=callback)))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            if not self._pending:
+                self.close()
+                raise StopIteration
+            if self.ordered:
+                filename, nbytes, task = self._pending.popleft()
+                result = task.get()
+            else:
+                result = self._ready.get()
+                for i, (filename, nbytes, _) in enumerate(self._pending):
+                    if filename == result.filename:
+                        del self._pending[i]
+                        break
+            self.nbytes -= nbytes
+            self._fill()
+            return result
+
+    next = __next__
+
+    def _next_or_none(self):
+        try:
+            return next(self)
+        except StopIteration:
+            return None
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        import asyncio
+        loop = asyncio.get_event_loop()
+        step = loop.create_future()
+
+        def done(future):
+            if step.cancelled():
+                return
+            if future.cancelled():
+                step.cancel()
+            elif future.exception() is not None:
+                step.set_exception(future.exception())
+            elif future.result() is None:
+                step.set_exception(StopAsyncIteration())
+            else:
+                step.set_result(future.result())
+
+        loop.run_in_executor(None, self._next_or_none).add_done_callback(done)
+        return step
+
+    def close(self):
+        '''Stop loading, discarding any files that were loaded ahead.'''
+        self._filenames = None
+        self._held = None
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
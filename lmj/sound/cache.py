@@ -0,0 +1,192 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Caches for preprocessed sound clips.'''
+
+import hashlib
+import json
+import logging
+import numpy as np
+import os
+import tempfile
+import time
+
+from .sound import Clip
+
+
+class DiskCache(object):
+    '''Store preprocessed clips on disk, so they can be reused across runs.
+
+    Each entry is a .npy file of samples plus a small .json file holding the
+    sample rate. Entries are keyed on the path, size, modification time and a
+    fingerprint of the contents of the source file, together with whatever
+    preprocessing parameters the caller provides. Cached samples are loaded
+    back memory-mapped (copy-on-write), so processes reading the same entry
+    share pages.
+
+    Files are written to temporary names and renamed into place, so several
+    processes can fill the same cache at once. Each hit touches the entry's
+    modification time; when the cache grows past its size limit, the least
+    recently used entries are removed, along with any temporary files that
+    were left behind by writers that crashed.
+    '''
+
+    # read this many bytes from each end of a source file to fingerprint it.
+    FINGERPRINT_BYTES = 1 << 20
+
+    # temporary files older than this many seconds are assumed to be left
+    # over from a crashed writer.
+    STALE_SECONDS = 3600
+
+    def __init__(self, root, max_bytes=1 << 34):
+        '''Initialize a cache in a directory on disk.
+
+        root: The directory that holds cache entries. Created if needed.
+        max_bytes: Evict entries when the cache holds more than this many
+          bytes of sample data.
+        '''
+        self.root = root
+        self.max_bytes = max_bytes
+        if not os.path.isdir(root):
+            try:
+                os.makedirs(root)
+            except OSError:
+                if not os.path.isdir(root):
+                    raise
+
+    def key(self, filename, **params):
+        '''Compute the cache key for a source file and preprocessing params.'''
+        stat = os.stat(filename)
+        digest = hashlib.sha1()
+        with open(filename, 'rb') as handle:
+            digest.update(handle.read(self.FINGERPRINT_BYTES))
+            if stat.st_size > 2 * self.FINGERPRINT_BYTES:
+                handle.seek(-self.FINGERPRINT_BYTES, os.SEEK_END)
+                digest.update(handle.read())
+        params.update(path=os.path.abspath(filename),
+                      size=stat.st_size,
+                      mtime=stat.st_mtime,
+                      content=digest.hexdigest())
+        return hashlib.sha1(repr(sorted(params.items())).encode('utf-8')).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.root, key + ext)
+
+    def get(self, filename, **params):
+        '''Get a cached clip, or None if there is no entry for it.
+
+        filename: The name of the source sound file.
+        params: Preprocessing parameters that the entry must match.
+        '''
+        key = self.key(filename, **params)
+        try:
+            with open(self._path(key, '.json')) as handle:
+                meta = json.load(handle)
+            samples = np.load(self._path(key, '.npy'), mmap_mode='c')
+            os.utime(self._path(key, '.npy'), None)
+        except (IOError, OSError, ValueError):
+            return None
+        clip = Clip(samples=samples, sample_rate=meta['sample_rate'])
+        clip.filename = filename
+        return clip
+
+    def put(self, filename, clip, **params):
+        '''Store a preprocessed clip in the cache.
+
+        filename: The name of the source sound file.
+        clip: The preprocessed sound.Clip to store.
+        params: Preprocessing parameters that produced the clip.
+        '''
+        key = self.key(filename, **params)
+        self._write(self._path(key, '.json'), lambda handle: handle.write(
+            json.dumps(dict(sample_rate=clip.sample_rate,
+                            filename=filename)).encode('utf-8')))
+        self._write(self._path(key, '.npy'), lambda handle: np.save(
+            handle, np.asarray(clip.samples)))
+        self.evict()
+
+    def _write(self, path, write):
+        '''Write a file atomically, by renaming a temporary file into place.'''
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                write(handle)
+            os.rename(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def entries(self):
+        '''Get a list of (access time, bytes, key) tuples for cached clips.'''
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith('.npy'):
+                try:
+                    stat = os.stat(os.path.join(self.root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name[:-4]))
+        return entries
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.root, name))
+        except OSError:
+            pass
+
+    def _remove_stale(self, max_age):
+        '''Remove temporary files that are older than max_age seconds.'''
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.root):
+            if name.endswith('.tmp'):
+                try:
+                    stale = os.stat(os.path.join(self.root, name)).st_mtime < cutoff
+                except OSError:
+                    continue
+                if stale:
+                    self._remove(name)
+
+    def clear(self):
+        '''Remove all entries and temporary files from the cache.
+
+        Writes that are in progress in other processes will fail.
+        '''
+        for name in os.listdir(self.root):
+            if name.endswith(('.npy', '.json', '.tmp')):
+                self._remove(name)
+
+    def evict(self):
+        '''Remove least recently used entries until the cache fits its limit.
+
+        Temporary files left behind by crashed writers are removed as well.
+        '''
+        self._remove_stale(self.STALE_SECONDS)
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(key + '.npy')
+            self._remove(key + '.json')
+            total -= size
+            logging.info('evicted %s from %s (%d bytes)', key, self.root, size)
@@ -0,0 +1,160 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Random access to fixed-width windows of a packed corpus of features.'''
+
+import numpy
+import numpy.random as rng
+import threading
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from .featurefile import FeatureFile, FeatureWriter
+
+
+def pack_clips(filename, clips, metadata=None):
+    '''Pack the samples of many clips into one feature file.
+
+    The resulting file has one frame per sample, so a FeatureDataset over it
+    gives windows of raw samples.
+
+    filename: The name of the feature file to write.
+    clips: A sequence of sound.Clip objects, e.g. from load_clip.
+    metadata: A JSON-serializable dictionary to store in the file.
+    '''
+    with FeatureWriter(filename, metadata) as writer:
+        for clip in clips:
+            writer.metadata.setdefault('sample_rate', clip.sample_rate)
+            writer.append(clip.filename, clip.samples)
+
+
+class FeatureDataset(object):
+    '''Sample fixed-width windows of consecutive frames from a feature file.
+
+    Every window lies within a single source file. Windows are numbered
+    consecutively across files, and a cumulative count of windows per file
+    maps window numbers back to (file, frame) positions.
+    '''
+
+    def __init__(self, features, width=1):
+        '''Initialize a dataset.
+
+        features: A FeatureFile, or the name of one.
+        width: The number of consecutive frames in each window.
+        '''
+        if not isinstance(features, FeatureFile):
+            features = FeatureFile(features)
+        self.features = features
+        self.width = width
+        windows = numpy.maximum(0, features.counts - width + 1)
+        self._cumulative = numpy.concatenate([[0], numpy.cumsum(windows)])
+        self._span = numpy.arange(width)
+
+    def __len__(self):
+        return int(self._cumulative[-1])
+
+    def locate(self, windows):
+        '''Convert window numbers to (file, frame) positions.
+
+        windows: An integer array of window numbers.
+
+        Returns a tuple of (file index, frame index) arrays.
+        '''
+        windows = numpy.asarray(windows)
+        files = numpy.searchsorted(self._cumulative, windows, 'right') - 1
+        return files, windows - self._cumulative[files]
+
+    def window(self, file, frame):
+        '''Get the window of frames starting at a frame of a source file.'''
+        start = self.features.offsets[file] + frame
+        return self.features.frames[start:start + self.width]
+
+    def gather(self, windows):
+        '''Get an array of windows, given their window numbers.
+
+        windows: An integer array of window numbers.
+
+        Returns an array of shape (len(windows), width) + frame shape.
+        '''
+        files, frames = self.locate(windows)
+        starts = self.features.offsets[files] + frames
+        return self.features.frames[starts[:, None] + self._span]
+
+    def iterbatches(self, size, replace=True, prefetch=2):
+        '''Generate minibatches of randomly chosen windows.
+
+        Batches are gathered on a background thread, so the next batches are
+        ready (up to prefetch of them) while the caller uses the current one.
+
+        size: The number of windows in each batch.
+        replace: If True, sample windows independently, forever. Otherwise,
+          visit every window once in a random order; the last batch may be
+          smaller than size.
+        prefetch: The number of batches to prepare ahead of the caller.
+
+        Generates (batch, files, frames) tuples, where batch is an array of
+        windows and files and frames give the position of each window.
+        '''
+        if replace:
+            def batches():
+                while True:
+                    yield rng.randint(len(self), size=size)
+        else:
+            def batches():
+                order = rng.permutation(len(self))
+                for i in range(0, len(order), size):
+                    yield order[i:i + size]
+
+        ready = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        done = object()
+
+        def fill():
+            try:
+                for windows in batches():
+                    item = (self.gather(windows), ) + self.locate(windows)
+                    while not stop.is_set():
+                        try:
+                            ready.put(item, timeout=0.1)
+                            break
+                        except queue.Full:
+                            pass
+                    if stop.is_set():
+                        return
+            except Exception as err:
+                ready.put(err)
+            ready.put(done)
+
+        thread = threading.Thread(target=fill)
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
@@ -0,0 +1,146 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''A binary, indexed file format for frames of features from many sounds.
+
+A feature file holds the frames computed from a set of source files in one
+contiguous array, so it can be memory-mapped. The layout is:
+
+  - 8 bytes: the magic string "LMJFEAT1"
+  - 8 bytes: the little-endian byte offset of the index
+  - padding up to byte DATA_OFFSET
+  - the frames, in C order, one source file after another
+  - the index: a JSON object giving the dtype and shape of each frame, the
+    name, first frame and frame count of each source file, and metadata such
+    as the sample rate, window, hop and transform used to compute features
+
+The index comes last so that files of any length can be written in one pass.
+'''
+
+import json
+import numpy as np
+import struct
+
+MAGIC = b'LMJFEAT1'
+DATA_OFFSET = 64
+
+
+class FeatureWriter(object):
+    '''Write frames of features to a feature file.'''
+
+    def __init__(self, filename, metadata=None):
+        '''Create a new feature file.
+
+        filename: The name of the file to write.
+        metadata: A JSON-serializable dictionary to store in the file.
+        '''
+        self.filename = filename
+        self.metadata = dict(metadata or {})
+        self.dtype = None
+        self.frame_shape = None
+        self.files = []
+        self.frames = 0
+        self._handle = open(filename, 'wb')
+        self._handle.write(MAGIC + struct.pack('<Q', 0))
+        self._handle.write(b'\0' * (DATA_OFFSET - self._handle.tell()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, name, frames):
+        '''Append the frames computed from one source file.
+
+        name: The name of the source file.
+        frames: An array of frames. Its first axis counts frames; all frames
+          in a feature file must have the same dtype and shape.
+        '''
+        frames = np.asarray(frames)
+        if self.dtype is None:
+            self.dtype = frames.dtype.newbyteorder('<')
+            self.frame_shape = frames.shape[1:]
+        if frames.shape[1:] != self.frame_shape:
+            raise ValueError('%s: frame shape %s is not %s' % (
+                name, frames.shape[1:], self.frame_shape))
+        np.ascontiguousarray(frames, self.dtype).tofile(self._handle)
+        self.files.append(dict(name=name, offset=self.frames, count=len(frames)))
+        self.frames += len(frames)
+
+    def close(self):
+        '''Write the index and close the file.'''
+        if self._handle.closed:
+            return
+        index = self._handle.tell()
+        self._handle.write(json.dumps(dict(
+            dtype=self.dtype.str if self.dtype else '<f8',
+            frame_shape=list(self.frame_shape or ()),
+            frames=self.frames,
+            files=self.files,
+            metadata=self.metadata)).encode('utf-8'))
+        self._handle.seek(len(MAGIC))
+        self._handle.write(struct.pack('<Q', index))
+        self._handle.close()
+
+
+class FeatureFile(object):
+    '''Read a feature file, with its frames mapped into memory.'''
+
+    def __init__(self, filename):
+        '''Open a feature file.
+
+        filename: The name of the file to read.
+        '''
+        self.filename = filename
+        with open(filename, 'rb') as handle:
+            magic, index = struct.unpack('<8sQ', handle.read(16))
+            if magic != MAGIC:
+                raise ValueError('%s: not a feature file' % filename)
+            if not index:
+                raise ValueError('%s: feature file was not closed' % filename)
+            handle.seek(index)
+            info = json.loads(handle.read().decode('utf-8'))
+        self.metadata = info['metadata']
+        self.dtype = np.dtype(info['dtype'])
+        self.frame_shape = tuple(info['frame_shape'])
+        self.names = [f['name'] for f in info['files']]
+        self.offsets = np.array([f['offset'] for f in info['files']] + [info['frames']])
+        self.frames = np.zeros((0, ) + self.frame_shape, self.dtype)
+        if info['frames']:
+            self.frames = np.memmap(filename,
+                                    dtype=self.dtype,
+                                    mode='r',
+                                    offset=DATA_OFFSET,
+                                    shape=(info['frames'], ) + self.frame_shape)
+        self._index = dict((name, i) for i, name in enumerate(self.names))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, key):
+        '''Get the frames for one source file, by position or by name.'''
+        i = self._index[key] if key in self._index else key
+        return self.frames[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def counts(self):
+        '''The number of frames for each source file.'''
+        return np.diff(self.offsets)
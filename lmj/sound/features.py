@@ -0,0 +1,190 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Spectral features computed from whole matrices of FFT frames.
+
+The functions here take a (frames, bins) array of FFT coefficients, such as
+the output of Clip.stft, and turn it into features with one matrix multiply.
+Filterbank and DCT matrices are built once and cached.
+
+For example, to compute 13 MFCCs for a clip:
+
+  offsets, coeffs = clip.stft(512, 160)
+  coeffs = features.mfcc(coeffs, clip.sample_rate, 512, n_coeffs=13)
+
+The FFT size (the frame width) must be passed explicitly, since an odd
+width and the even width below it give the same number of bins.
+'''
+
+import numpy
+
+from .gammatone import erb, erb_space
+
+_FILTERBANKS = {}
+_DCTS = {}
+
+
+def hz_to_mel(f):
+    '''Convert frequencies in Hz to the mel scale.'''
+    return 2595. * numpy.log10(1. + numpy.asarray(f) / 700.)
+
+
+def mel_to_hz(m):
+    '''Convert mel-scale values to frequencies in Hz.'''
+    return 700. * (10. ** (numpy.asarray(m) / 2595.) - 1.)
+
+
+def _triangles(freqs, lower, centers, upper):
+    '''Build triangular filters with the given corners, one per row.'''
+    rise = (freqs - lower[:, None]) / (centers - lower)[:, None]
+    fall = (upper[:, None] - freqs) / (upper - centers)[:, None]
+    return numpy.maximum(0, numpy.minimum(rise, fall))
+
+
+def filterbank(sample_rate, n_fft, n_bands, scale='mel', low=0., high=None):
+    '''Get a (cached) matrix of triangular filters over FFT bins.
+
+    sample_rate: The sample rate of the analyzed sound, in Hz.
+    n_fft: The FFT size (the frame width) used to compute spectra. It may be
+      odd.
+    n_bands: The number of filters.
+    scale: One of 'mel', 'erb' or 'linear'. Mel and linear filters are spaced
+      evenly on their scale, with each triangle reaching to the centers of its
+      neighbors. ERB filters are spaced evenly on the ERB-rate scale, and each
+      triangle is erb(f) wide at half height, so that its equivalent
+      rectangular bandwidth matches the auditory filter at its center.
+    low: The lowest frequency covered by the filters, in Hz.
+    high: The highest frequency covered, in Hz. Defaults to the Nyquist
+      frequency.
+
+    Returns an (n_bands, n_fft // 2 + 1) array.
+    '''
+    high = sample_rate / 2. if high is None else high
+    key = (sample_rate, n_fft, n_bands, scale, low, high)
+    if key not in _FILTERBANKS:
+        freqs = numpy.arange(n_fft // 2 + 1) * float(sample_rate) / n_fft
+        if scale == 'erb':
+            centers = erb_space(low, high, n_bands)
+            lower, upper = centers - erb(centers), centers + erb(centers)
+        else:
+            if scale == 'mel':
+                edges = mel_to_hz(numpy.linspace(hz_to_mel(low), hz_to_mel(high), n_bands + 2))
+            elif scale == 'linear':
+                edges = numpy.linspace(low, high, n_bands + 2)
+            else:
+                raise ValueError('unknown filterbank scale %r' % scale)
+            lower, centers, upper = edges[:-2], edges[1:-1], edges[2:]
+        bank = _triangles(freqs, lower, centers, upper)
+        bank.flags.writeable = False
+        _FILTERBANKS[key] = bank
+    return _FILTERBANKS[key]
+
+
+def dct_matrix(n_inputs, n_outputs=None):
+    '''Get a (cached) orthonormal DCT-II matrix.
+
+    Returns an (n_outputs, n_inputs) array. Multiplying a vector by this
+    matrix computes the first n_outputs DCT coefficients of the vector.
+    '''
+    n_outputs = n_outputs or n_inputs
+    key = (n_inputs, n_outputs)
+    if key not in _DCTS:
+        k = numpy.arange(n_outputs)[:, None]
+        n = numpy.arange(n_inputs)[None, :]
+        dct = numpy.cos(numpy.pi * k * (2 * n + 1) / (2. * n_inputs))
+        dct *= numpy.sqrt(2. / n_inputs)
+        dct[0] /= numpy.sqrt(2.)
+        dct.flags.writeable = False
+        _DCTS[key] = dct
+    return _DCTS[key]
+
+
+def power(coeffs):
+    '''Compute the power spectrum of a matrix of FFT coefficients.'''
+    return coeffs.real ** 2 + coeffs.imag ** 2
+
+
+def band_spectrum(coeffs, sample_rate, n_fft, n_bands=40, scale='mel', low=0.,
+                  high=None):
+    '''Compute band energies of FFT frames with a triangular filterbank.
+
+    coeffs: A (frames, bins) array of FFT coefficients.
+    sample_rate: The sample rate of the analyzed sound, in Hz.
+    n_fft: The FFT size (the frame width) used to compute the coefficients.
+    n_bands: The number of filters.
+    scale: One of 'mel', 'erb' or 'linear'. See filterbank().
+    low: The lowest frequency covered by the filters, in Hz.
+    high: The highest frequency covered, in Hz.
+
+    Returns a (frames, n_bands) array.
+    '''
+    if coeffs.shape[-1] != n_fft // 2 + 1:
+        raise ValueError('%d bins do not match an FFT size of %d' % (
+            coeffs.shape[-1], n_fft))
+    bank = filterbank(sample_rate, n_fft, n_bands, scale, low, high)
+    return power(coeffs).dot(bank.T)
+
+
+def mel_spectrum(coeffs, sample_rate, n_fft, n_bands=40, low=0., high=None):
+    '''Compute mel-band energies of FFT frames. See band_spectrum().'''
+    return band_spectrum(coeffs, sample_rate, n_fft, n_bands, 'mel', low, high)
+
+
+def log_mel_spectrum(coeffs, sample_rate, n_fft, n_bands=40, low=0., high=None,
+                     floor=1e-10):
+    '''Compute the log of mel-band energies of FFT frames.
+
+    floor: Clip band energies below at this value before taking the log.
+    '''
+    return numpy.log(numpy.maximum(
+        floor, mel_spectrum(coeffs, sample_rate, n_fft, n_bands, low, high)))
+
+
+def mfcc(coeffs, sample_rate, n_fft, n_coeffs=13, n_bands=40, low=0., high=None,
+         floor=1e-10):
+    '''Compute mel-frequency cepstral coefficients of FFT frames.
+
+    coeffs: A (frames, bins) array of FFT coefficients.
+    sample_rate: The sample rate of the analyzed sound, in Hz.
+    n_fft: The FFT size (the frame width) used to compute the coefficients.
+    n_coeffs: The number of cepstral coefficients to keep.
+    n_bands: The number of mel filters.
+    low: The lowest frequency covered by the filters, in Hz.
+    high: The highest frequency covered, in Hz.
+    floor: Clip band energies below at this value before taking the log.
+
+    Returns a (frames, n_coeffs) array.
+    '''
+    logmel = log_mel_spectrum(coeffs, sample_rate, n_fft, n_bands, low, high, floor)
+    return logmel.dot(dct_matrix(n_bands, n_coeffs).T)
+
+
+def cepstrum(coeffs, n_fft, n_coeffs=None, floor=1e-10):
+    '''Compute the real cepstrum of FFT frames.
+
+    coeffs: A (frames, bins) array of FFT coefficients.
+    n_fft: The FFT size (the frame width) used to compute the coefficients.
+    n_coeffs: If given, keep only this many low-quefrency coefficients.
+    floor: Clip powers below at this value before taking the log.
+
+    Returns a (frames, n_coeffs) array.
+    '''
+    ceps = numpy.fft.irfft(numpy.log(numpy.maximum(floor, power(coeffs))), n_fft, axis=-1)
+    return ceps[:, :n_coeffs] if n_coeffs else ceps
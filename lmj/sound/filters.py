@@ -0,0 +1,103 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Butterworth filters in second-order sections.
+
+High-order filters in (b, a) polynomial form lose precision quickly; a cascade
+of second-order sections stays numerically stable at any order. Filter designs
+are cached, and Filter objects carry their state from one block of samples to
+the next so that long sounds can be filtered in bounded memory.
+'''
+
+import numpy
+
+_DESIGNS = {}
+
+
+def design(order, cutoff, sample_rate, btype='lowpass'):
+    '''Get a (cached) Butterworth filter design in second-order sections.
+
+    order: The order of the filter.
+    cutoff: The cutoff frequency in Hz, or a (low, high) pair of frequencies
+      for 'bandpass' and 'bandstop' filters.
+    sample_rate: The sample rate of the sound to be filtered, in Hz.
+    btype: One of 'lowpass', 'highpass', 'bandpass' or 'bandstop'.
+
+    Returns a read-only (n, 6) array of second-order sections, which is
+    shared by all callers that ask for the same design. scipy.signal.sosfilt
+    needs a writable array, so pass it a copy.
+    '''
+    if numpy.ndim(cutoff):
+        cutoff = tuple(cutoff)
+    key = (order, cutoff, sample_rate, btype)
+    if key not in _DESIGNS:
+        import scipy.signal
+        sos = scipy.signal.butter(
+            order, numpy.asarray(cutoff) / (sample_rate / 2.), btype, output='sos')
+        sos.flags.writeable = False
+        _DESIGNS[key] = sos
+    return _DESIGNS[key]
+
+
+class Filter(object):
+    '''A causal filter that keeps its state between blocks of samples.
+
+    Call a filter with consecutive blocks of a sound; the concatenated outputs
+    are the same as filtering the whole sound at once. Filtering runs in the
+    precision of the samples: the first block of float32 samples switches
+    the filter to single precision.
+    '''
+
+    def __init__(self, sos):
+        '''Initialize the filter.
+
+        sos: An array of second-order sections, e.g. from design().
+        '''
+        # sosfilt needs a writable copy; cached designs are read-only.
+        self.sos = numpy.array(sos)
+        self.reset()
+
+    def reset(self):
+        '''Reset the filter state, as if no samples had been seen.'''
+        self._zi = numpy.zeros((len(self.sos), 2), self.sos.dtype)
+
+    def __call__(self, samples):
+        '''Filter a block of samples, returning the filtered block.'''
+        import scipy.signal
+        samples = numpy.asarray(samples)
+        if samples.dtype.kind == 'f' and samples.dtype != self._zi.dtype:
+            self.sos = self.sos.astype(samples.dtype)
+            self._zi = self._zi.astype(samples.dtype)
+        output, self._zi = scipy.signal.sosfilt(self.sos, samples, zi=self._zi)
+        return output
+
+
+def filter_blocks(blocks, sos):
+    '''Filter a stream of blocks of samples.
+
+    blocks: An iterable of 1-dimensional arrays of consecutive samples, for
+      example StreamingClip.iter_blocks().
+    sos: An array of second-order sections, e.g. from design().
+
+    Generates a sequence of filtered blocks.
+    '''
+    filt = Filter(sos)
+    for block in blocks:
+        yield filt(block)
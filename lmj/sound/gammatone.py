@@ -30,8 +30,11 @@ References:
   https://ccrma.stanford.edu/~jos/bbt/Equivalent_Rectangular_Bandwidth.html
 '''
 
+import collections
 import numpy
 
+from . import instrument
+
 TAU = 2 * numpy.pi
 
 
@@ -85,3 +88,151 @@ def Gammatone(center_freq, bandwidth=erb, order=4, phase=0.):
     use a different amplitude.
     '''
     return Gammachirp(center_freq, bandwidth, order=order, phase=phase)
+
+
+def erb_space(low, high, count):
+    '''Return center frequencies spaced evenly on the ERB-rate scale.
+
+    The ERB-rate scale used here is the integral of 1 / erb(f), so adjacent
+    frequencies are separated by a constant fraction of their bandwidth.
+
+    low: The lowest center frequency, in Hz.
+    high: The highest center frequency, in Hz.
+    count: The number of center frequencies to return.
+    '''
+    rates = numpy.linspace(numpy.log(erb(low)), numpy.log(erb(high)), count)
+    return (numpy.exp(rates) - 24.7) / 0.1039
+
+
+class GammatoneFilterbank(object):
+    '''A bank of gammatone (or gammachirp) filters applied as one operation.
+
+    The impulse responses of all channels are tabulated once into a
+    (channels, taps) array, which is shared among filterbanks with the same
+    parameters. Filtering a sound convolves it with every channel at once
+    using FFT-based overlap-save convolution.
+    '''
+
+    # the most recently used kernel tables, shared among filterbanks. at most
+    # MAX_KERNELS tables are kept; the least recently used ones are dropped.
+    MAX_KERNELS = 16
+    _KERNELS = collections.OrderedDict()
+
+    def __init__(self, center_freqs, sample_rate, bandwidth=erb, chirp=0.,
+                 order=4, phase=0., duration=None, normalize=True):
+        '''Initialize a filterbank.
+
+        center_freqs: A sequence of center frequencies, in Hz, one per channel.
+        sample_rate: The sample rate, in Hz, of sounds to be filtered.
+        bandwidth: A bandwidth in Hz, or a callable that maps center
+          frequencies to bandwidths.
+        chirp: The degree of frequency asymmetry in the chirp.
+        order: The slope of the impulse response envelope.
+        phase: The relative offset of the sinusoid within the envelope.
+        duration: The length, in seconds, of the tabulated impulse responses.
+          By default, this is long enough for the envelope of the channel
+          with the narrowest bandwidth to decay by about 60dB.
+        normalize: If True, scale each channel to unit gain at its center
+          frequency. Otherwise each channel has the amplitude of Gammachirp.
+        '''
+        self.center_freqs = numpy.asarray(center_freqs, float)
+        self.sample_rate = sample_rate
+        bw = bandwidth(self.center_freqs) if callable(bandwidth) else bandwidth
+        self.bandwidths = bw * numpy.ones_like(self.center_freqs)
+        if duration is None:
+            duration = (order + 11.) / (TAU * self.bandwidths.min())
+        self.taps = int(numpy.ceil(duration * sample_rate))
+
+        key = (tuple(self.center_freqs), tuple(self.bandwidths), sample_rate,
+               chirp, order, phase, self.taps, normalize)
+        kernels = self._KERNELS.pop(key, None)
+        if kernels is None:
+            kernels = self._tabulate(chirp, order, phase, normalize)
+        self._KERNELS[key] = self.kernels = kernels
+        while len(self._KERNELS) > self.MAX_KERNELS:
+            self._KERNELS.popitem(last=False)
+        self._spectra = {}
+
+    def __len__(self):
+        return len(self.center_freqs)
+
+    def _tabulate(self, chirp, order, phase, normalize):
+        '''Evaluate the impulse responses of all channels.'''
+        t = numpy.arange(self.taps) / float(self.sample_rate)
+        f = self.center_freqs[:, None]
+        bend = 0.
+        if chirp > 0:
+            bend = chirp * numpy.log(numpy.maximum(t, 1. / self.sample_rate))
+        osc = numpy.cos(TAU * f * t + phase + bend)
+        env = numpy.exp(-TAU * self.bandwidths[:, None] * t)
+        kernels = t ** (order - 1) * env * osc
+        if normalize:
+            gain = abs((kernels * numpy.exp(-1j * TAU * f * t)).sum(axis=1))
+            kernels /= gain[:, None]
+        kernels.flags.writeable = False
+        return kernels
+
+    def _spectrum(self, size):
+        '''Get the (cached) FFT of all impulse responses for a block size.'''
+        if size not in self._spectra:
+            self._spectra[size] = numpy.fft.rfft(self.kernels, size, axis=-1)
+        return self._spectra[size]
+
+    def _samples(self, sound):
+        '''Get an array of samples from a sound.Clip or an array.'''
+        rate = getattr(sound, 'sample_rate', self.sample_rate)
+        if rate != self.sample_rate:
+            raise ValueError('sample rate %s is not %s' % (rate, self.sample_rate))
+        return numpy.asarray(getattr(sound, 'samples', sound))
+
+    def _iter_blocks(self, samples, multiple=1):
+        '''Overlap-save convolve samples with all channels, block by block.
+
+        Generates (offset, outputs) tuples, where outputs is a (channels, n)
+        array of filter outputs. Each n, except possibly the last, is a
+        multiple of the given number.
+        '''
+        L = self.taps
+        size = 1 << int(numpy.ceil(numpy.log2(4 * L)))
+        step = max(multiple, (size - L + 1) // multiple * multiple)
+        while step > size - L + 1:
+            size *= 2
+        spectrum = self._spectrum(size)
+        padded = numpy.concatenate([numpy.zeros(L - 1), samples])
+        for start in range(0, len(samples), step):
+            segment = padded[start:start + size]
+            y = numpy.fft.irfft(numpy.fft.rfft(segment, size) * spectrum, size)
+            n = min(step, len(samples) - start)
+            yield start, y[:, L - 1:L - 1 + n]
+
+    @instrument.Timer('gammatone.filter')
+    def filter(self, sound):
+        '''Filter a sound through every channel of this filterbank.
+
+        sound: A sound.Clip, or a 1-dimensional array of samples.
+
+        Returns a (channels, samples) array of filter outputs.
+        '''
+        samples = self._samples(sound)
+        output = numpy.empty((len(self), len(samples)))
+        for start, y in self._iter_blocks(samples):
+            output[:, start:start + y.shape[1]] = y
+        return output
+
+    def cochleagram(self, sound, decimate=1):
+        '''Compute the RMS envelope of each channel of this filterbank.
+
+        sound: A sound.Clip, or a 1-dimensional array of samples.
+        decimate: Pool the envelope over non-overlapping windows of this many
+          samples. Trailing samples that do not fill a window are dropped.
+
+        Returns a (channels, samples // decimate) array.
+        '''
+        samples = self._samples(sound)
+        output = numpy.empty((len(self), len(samples) // decimate))
+        for start, y in self._iter_blocks(samples, decimate):
+            n = y.shape[1] // decimate
+            power = (y[:, :n * decimate] ** 2).reshape((len(self), n, decimate))
+            output[:, start // decimate:start // decimate + n] = numpy.sqrt(
+                power.mean(axis=-1))
+        return output
@@ -0,0 +1,221 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Timers and counters for the hot paths in lmj.sound.
+
+Operations in lmj.sound (loading, filtering, resampling, transforms) are
+wrapped in Timers. Each Timer sends one event to every registered sink when
+it finishes: a dict with the name of the operation, its wall time in seconds,
+the number of samples it produced, the bytes it allocated for its output,
+and the name of the exception it raised, if any.
+
+When no sinks are registered, which is the default, a Timer only checks an
+empty list, so instrumentation costs close to nothing. To collect events:
+
+  summary = lmj.sound.instrument.Summary()
+  with lmj.sound.instrument.capture(summary):
+      clip = lmj.sound.load_clip('foo.wav', 16000)
+      ...
+  print summary.report()
+
+Timers also work as decorators (or context managers) for user stages:
+
+  @lmj.sound.instrument.Timer('my-features')
+  def features(clip):
+      ...
+'''
+
+import json
+import time
+import timeit
+import functools
+import threading
+import contextlib
+
+import numpy
+
+_now = timeit.default_timer
+
+# the active sinks. instrumentation is off when this is empty.
+_sinks = []
+
+
+def enabled():
+    '''Return True if any sinks are registered.'''
+    return bool(_sinks)
+
+
+def add_sink(sink):
+    '''Register a sink, a callable that takes one event dict.
+
+    Returns the sink.
+    '''
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    '''Unregister a sink.'''
+    _sinks.remove(sink)
+
+
+@contextlib.contextmanager
+def capture(*sinks):
+    '''Register some sinks for the duration of a with block.'''
+    for sink in sinks:
+        add_sink(sink)
+    try:
+        yield sinks[0] if len(sinks) == 1 else sinks
+    finally:
+        for sink in sinks:
+            remove_sink(sink)
+
+
+def emit(name, seconds=0., samples=0, bytes=0, error=None):
+    '''Send an event to all sinks.
+
+    name: The name of the operation.
+    seconds: The wall time taken by the operation.
+    samples: The number of samples the operation produced.
+    bytes: The number of bytes the operation allocated for its output.
+    error: The name of the exception raised by the operation, if any.
+    '''
+    if not _sinks:
+        return
+    event = dict(name=name, time=time.time(), seconds=seconds,
+                 samples=int(samples), bytes=int(bytes), error=error)
+    for sink in list(_sinks):
+        sink(event)
+
+
+class Timer(object):
+    '''Time an operation, as a context manager or as a decorator.
+
+    As a context manager, call output() (or set the samples and bytes
+    attributes) inside the with block to record the size of the output:
+
+      with Timer('clip.load') as timer:
+          ...
+          timer.output(clip.samples)
+
+    As a decorator, any numpy array returned by the function is recorded as
+    its output.
+    '''
+
+    __slots__ = ('name', 'samples', 'bytes', '_start')
+
+    def __init__(self, name, samples=0, bytes=0):
+        self.name = name
+        self.samples = samples
+        self.bytes = bytes
+        self._start = None
+
+    def output(self, array):
+        '''Record a numpy array as the output of this operation.'''
+        self.samples = array.size
+        self.bytes = array.nbytes
+        return array
+
+    def __enter__(self):
+        if _sinks:
+            self._start = _now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._start is not None:
+            emit(self.name, _now() - self._start, self.samples, self.bytes,
+                 exc_type and exc_type.__name__)
+            self._start = None
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+            with Timer(name) as timer:
+                result = func(*args, **kwargs)
+                if isinstance(result, numpy.ndarray):
+                    timer.output(result)
+            return result
+
+        return wrapper
+
+
+class Summary(object):
+    '''A sink that accumulates calls, errors, time, samples and bytes.'''
+
+    FIELDS = ('calls', 'errors', 'seconds', 'samples', 'bytes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def __call__(self, event):
+        with self._lock:
+            totals = self.totals.get(event['name'])
+            if totals is None:
+                totals = self.totals[event['name']] = dict.fromkeys(self.FIELDS, 0)
+            totals['calls'] += 1
+            totals['errors'] += event['error'] is not None
+            totals['seconds'] += event['seconds']
+            totals['samples'] += event['samples']
+            totals['bytes'] += event['bytes']
+
+    def reset(self):
+        '''Discard all accumulated totals.'''
+        with self._lock:
+            self.totals = {}
+
+    def report(self):
+        '''Format the totals as a table, slowest operations first.'''
+        lines = ['%-30s %8s %10s %14s %10s' % (
+            'operation', 'calls', 'seconds', 'samples/s', 'MB')]
+        for name, t in sorted(self.totals.items(), key=lambda kv: -kv[1]['seconds']):
+            rate = t['samples'] / t['seconds'] if t['seconds'] else 0.
+            lines.append('%-30s %8d %10.4f %14.0f %10.1f' % (
+                name, t['calls'], t['seconds'], rate, t['bytes'] / 1e6))
+        return '\n'.join(lines)
+
+
+class JsonLines(object):
+    '''A sink that writes each event as one line of JSON.'''
+
+    def __init__(self, output):
+        '''Initialize this sink.
+
+        output: A filename to append events to, or an open file-like object.
+        '''
+        self._lock = threading.Lock()
+        self._owned = not hasattr(output, 'write')
+        self.handle = open(output, 'a') if self._owned else output
+
+    def __call__(self, event):
+        line = json.dumps(event, sort_keys=True) + '\n'
+        with self._lock:
+            self.handle.write(line)
+
+    def close(self):
+        '''Flush events, and close the output if this sink opened it.'''
+        with self._lock:
+            self.handle.flush()
+            if self._owned:
+                self.handle.close()
@@ -24,62 +24,85 @@ import numpy
 import numpy.random as rng
 
 
+def iterwhiteblocks(size=1024):
+    '''Generate a sequence of blocks of white noise.
+
+    size: The number of samples in each block.
+
+    Generates a never-ending sequence of numpy arrays.
+    '''
+    while True:
+        yield rng.randn(size)
+
+
 def iterwhite():
     '''Generate a sequence of samples of white noise.
 
     Generates a never-ending sequence of floating-point values.
     '''
-    while True:
-        for n in rng.randn(100):
+    for block in iterwhiteblocks():
+        for n in block:
             yield n
 
 
-def iterpink(depth=20):
-    '''Generate a sequence of samples of pink noise.
+def iterpinkblocks(size=1024, depth=20):
+    '''Generate a sequence of blocks of pink noise.
 
     Based on the Voss-McCartney algorithm, discussion and code examples at
     http://www.firstpr.com.au/dsp/pink-noise/
 
+    At each sample, the counter advances by one and the value whose index is
+    the number of trailing zeros of the counter is replaced with a new white
+    noise sample. Rather than stepping through samples one at a time, each
+    block finds all of the replacements for each value at once and turns them
+    into a running sum with numpy.cumsum. The values and counter carry over
+    from one block to the next, so consecutive blocks form one continuous
+    stream of noise.
+
+    size: The number of samples in each block.
     depth: Use this many samples of white noise to calculate the output. A
-      higher number is slower to run, but renders low frequencies with more
-      correct power spectra.
+      higher number renders low frequencies with more correct power spectra.
 
-    Generates a never-ending sequence of floating-point values. Any continuous
-    set of these samples will tend to have a 1/f power spectrum.
+    Generates a never-ending sequence of numpy arrays. Any continuous set of
+    these samples will tend to have a 1/f power spectrum.
     '''
     values = rng.randn(depth)
-    smooth = rng.randn(depth)
-    source = rng.randn(depth)
-    sum = values.sum()
+    bits = range(int(depth - 1).bit_length())
     i = 0
     while True:
-        yield sum + smooth[i]
+        # the counter value after each sample. a value of 0 means the counter
+        # wrapped, in which case no values are replaced.
+        counter = (i + numpy.arange(1, size + 1)) % depth
+        zeros = numpy.log2(numpy.maximum(1, counter & -counter)).astype(int)
+        zeros[counter == 0] = -1
+
+        # accumulate the change in the sum caused by each replacement.
+        delta = numpy.zeros(size)
+        for c in bits:
+            events = (zeros == c).nonzero()[0]
+            if len(events):
+                new = rng.randn(len(events))
+                delta[events] = numpy.diff(numpy.concatenate([[values[c]], new]))
+                values[c] = new[-1]
+
+        # each sample is the sum before that sample's replacement, plus noise.
+        before = values.sum() - delta.sum() + numpy.cumsum(delta) - delta
+        yield before + rng.randn(size)
+        i = counter[-1]
 
-        # advance the index by 1. if the index wraps, generate noise to use in
-        # the calculations, but do not update any of the pink noise values.
-        i += 1
-        if i == depth:
-            i = 0
-            smooth = rng.randn(depth)
-            source = rng.randn(depth)
-            continue
 
-        # count trailing zeros in i
-        c = 0
-        while not (i >> c) & 1:
-            c += 1
-
-        # replace value c with a new source element
-        sum += source[i] - values[c]
-        values[c] = source[i]
+def iterpink(depth=20):
+    '''Generate a sequence of samples of pink noise.
 
+    depth: Use this many samples of white noise to calculate the output. A
+      higher number renders low frequencies with more correct power spectra.
 
-def _asarray(source, shape):
-    noise = source()
-    if shape is None:
-        return noise.next()
-    count = reduce(operator.mul, shape)
-    return numpy.asarray([noise.next() for _ in range(count)]).reshape(shape)
+    Generates a never-ending sequence of floating-point values. Any continuous
+    set of these samples will tend to have a 1/f power spectrum.
+    '''
+    for block in iterpinkblocks(depth=depth):
+        for n in block:
+            yield n
 
 
 def white(shape=None):
@@ -88,7 +111,9 @@ def white(shape=None):
     shape: If given, returns a numpy array of white noise with this shape. If
       not given, return just one sample of white noise.
     '''
-    return _asarray(iterwhite, shape)
+    if shape is None:
+        return rng.randn()
+    return rng.randn(int(numpy.prod(shape))).reshape(shape)
 
 
 def pink(shape=None, depth=20):
@@ -97,10 +122,12 @@ def pink(shape=None, depth=20):
     shape: If given, returns a numpy array of noise with this shape. If not
       given, return just one sample of noise.
     depth: Use this many samples of white noise to calculate pink noise. A
-      higher number is slower to run, but renders low frequencies with more
-      correct power spectra.
+      higher number renders low frequencies with more correct power spectra.
     '''
-    return _asarray(lambda: iterpink(depth), shape)
+    if shape is None:
+        return pink(1, depth)[0]
+    size = int(numpy.prod(shape))
+    return next(iterpinkblocks(size, depth)).reshape(shape)
 
 
 if __name__ == '__main__':
@@ -30,12 +30,17 @@ class Repertoire(list):
     '''A repertoire is a bunch of sound clips that can be mixed into an output.
     '''
 
-    def __init__(self, clips):
+    def __init__(self, clips, dtype=None):
         '''Initialize this repertoire with some clips.
 
         clips: A sequence of sound.Clip objects containing sound data.
+        dtype: If given, convert clips to this floating point type as they
+          are added, and mix in this precision. Otherwise all clips must have
+          the same type as the first.
         '''
-        self.dtype = None
+        # the type that clips are converted to, if the caller asked for one.
+        self._convert = None if dtype is None else numpy.dtype(dtype)
+        self.dtype = self._convert
         self.frame_shape = None
         self.sample_rate = None
         self.extend(clips)
@@ -45,6 +50,8 @@ class Repertoire(list):
 
         clip: A sound.Clip object to add.
         '''
+        if self._convert is not None and clip.dtype != self._convert:
+            clip = clip.astype(self._convert)
         if not self:
             self.dtype = clip.dtype
             self.frame_shape = clip.shape[1:]
@@ -75,27 +82,88 @@ class Repertoire(list):
 
         overlap: A value in [0, 1] that indicates the proportion of each clip to
           overlap in the resulting stream.
+
+        Generates a sequence of output samples. See chain_blocks() for a
+        faster interface that generates blocks of samples.
+        '''
+        for segment in self._chain_segments(overlap, 'linear'):
+            for sample in segment:
+                yield sample
+
+    def chain_blocks(self, overlap=0.25, block_size=4096, fade='linear'):
+        '''Chain together clips from our repertoire, in blocks of samples.
+
+        To render a fixed-length stream offline, take just the first block,
+        e.g. next(rep.chain_blocks(block_size=10 * rep.sample_rate)).
+
+        overlap: A value in [0, 1] that indicates the proportion of each clip to
+          overlap in the resulting stream.
+        block_size: The number of samples in each generated block.
+        fade: Either 'linear' or 'equal-power', the shape of the crossfade
+          between overlapping clips.
+
+        Generates a never-ending sequence of numpy arrays.
+        '''
+        shape = (block_size, ) + self.frame_shape
+        block = numpy.empty(shape, self.dtype)
+        n = 0
+        for segment in self._chain_segments(overlap, fade):
+            while len(segment):
+                k = min(block_size - n, len(segment))
+                block[n:n + k] = segment[:k]
+                segment = segment[k:]
+                n += k
+                if n == block_size:
+                    yield block
+                    block = numpy.empty(shape, self.dtype)
+                    n = 0
+
+    def _chain_segments(self, overlap, fade):
+        '''Generate consecutive segments of chained output.
+
+        Each clip contributes a segment of its own samples, followed by a
+        segment that crossfades its tail into the head of the next clip. The
+        crossfade is shortened when the next clip is shorter than it.
         '''
+        if fade not in ('linear', 'equal-power'):
+            raise ValueError('unknown crossfade %r' % fade)
+        ramps = {}
         active = self[rng.randint(len(self))]
-        active_offset = 0
-        target = None
-        target_offset = None
+        offset = 0
         while True:
-            if active_offset > (1. - overlap) * len(active):
-                if target is None:
-                    target = self[rng.randint(len(self))]
-                    target_offset = 0
-                mix = (len(active) - active_offset) / (overlap * len(active))
-                yield mix * active[active_offset] + (1 - mix) * target[target_offset]
-                target_offset += 1
-            else:
-                yield active[active_offset]
-            active_offset += 1
-            if active_offset == len(active):
-                active = target
-                active_offset = target_offset
-                target = None
-                target_offset = None
+            n = len(active)
+            target = self[rng.randint(len(self))]
+            cross = min(n, max(offset, int((1. - overlap) * n) + 1))
+            span = overlap * n
+            if n - cross > len(target):
+                cross = n - len(target)
+                span = len(target)
+            if cross > offset:
+                yield active[offset:cross]
+            if cross == n:
+                active, offset = target, 0
+                continue
+            key = (n, cross, span)
+            if key not in ramps:
+                ramps[key] = self._crossfade_ramps(n, cross, span, fade)
+            a, b = ramps[key]
+            yield a * active[cross:] + b * target[:n - cross]
+            active, offset = target, n - cross
+
+    def _crossfade_ramps(self, n, cross, span, fade):
+        '''Build gains for the outgoing and incoming clips of a crossfade.
+
+        The crossfade covers samples [cross, n) of the outgoing clip, and the
+        outgoing gain falls by 1 / span per sample.
+        '''
+        mix = (n - numpy.arange(cross, n)) / float(span)
+        if fade == 'linear':
+            a, b = mix, 1 - mix
+        else:
+            a, b = numpy.sin(numpy.pi / 2 * mix), numpy.cos(numpy.pi / 2 * mix)
+        shape = (len(mix), ) + (1, ) * len(self.frame_shape)
+        return (a.reshape(shape).astype(self.dtype),
+                b.reshape(shape).astype(self.dtype))
 
     def itercontrols(self, scale=1., min_coeff=0.):
         '''Generate a sequence of control signals.
@@ -124,32 +192,65 @@ class Repertoire(list):
           pairs.
         control_rate: The rate (in Hz) at which control frames are generated.
 
-        Returns a sound.Clip object containing the mixed sound.
+        Generates a sequence of output samples. See render() for a faster
+        interface that generates blocks of samples.
+        '''
+        for block in self.render(controls, control_rate):
+            for sample in block:
+                yield sample
+
+    def render(self, controls, control_rate=1., block_size=4096):
+        '''Mix the clips in this repertoire into blocks of output sound.
+
+        controls: A sequence of control frames. Each control frame should
+          consist of a tuple (possibly empty) containing (index, coefficient)
+          pairs.
+        control_rate: The rate (in Hz) at which control frames are generated.
+        block_size: The number of samples in each generated block.
+
+        Generates a sequence of numpy arrays. All blocks but the last contain
+        block_size samples; the output ends when the controls run out.
         '''
         controls = iter(controls)
 
-        # set up a circular buffer (2x the max length of a clip) to hold data
-        # for future frames. we rotate the second half of this buffer to the
-        # first half whenever s == N, giving amortized O(1) append runtime.
+        # set up a circular buffer to hold data for future frames. this needs
+        # room for one block plus the longest clip starting at the end of the
+        # block, so we allocate 2x that and rotate the unread part of the
+        # buffer to the front whenever s passes the halfway point, giving
+        # amortized O(1) append runtime.
         # http://mail.scipy.org/pipermail/scipy-user/2009-February/020108.html
-        N = max(len(w) for w in self)
+        N = max(len(w) for w in self) + block_size
         staging = numpy.zeros((2 * N, ) + self.frame_shape, self.dtype)
         s = 0
 
+        # onset is the offset from s of the next control frame. wait tracks
+        # the fractional number of samples between control frames exactly as
+        # a sample-by-sample countdown would.
         samples_per_control = float(self.sample_rate) / control_rate
         wait = 0.
+        onset = 0
         while True:
-            if wait <= 0:
-                wait += samples_per_control
-                for index, coeff in controls.next():
+            while onset < block_size:
+                try:
+                    frame = next(controls)
+                except StopIteration:
+                    if onset:
+                        yield staging[s:s + onset].copy()
+                    return
+                for index, coeff in frame:
                     w = self[index]
-                    staging[s:s + len(w)] += coeff * w
-            yield staging[s]
-            wait -= 1
-            s += 1
-            if s == N:
-                staging[:N] = staging[N:]
-                staging[N:] = 0.
+                    gain = self.dtype.type(coeff)
+                    staging[s + onset:s + onset + len(w)] += gain * w.samples
+                wait += samples_per_control
+                gap = max(1, int(numpy.ceil(wait)))
+                wait -= gap
+                onset += gap
+            yield staging[s:s + block_size].copy()
+            onset -= block_size
+            s += block_size
+            if s >= N:
+                staging[:2 * N - s] = staging[s:]
+                staging[2 * N - s:] = 0.
                 s = 0
 
 
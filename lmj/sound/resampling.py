@@ -0,0 +1,221 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Polyphase resampling by rational ratios.
+
+To change the sample rate of a sound by a factor of up / down, the sound is
+(conceptually) upsampled by inserting up - 1 zeros between samples, lowpass
+filtered to remove images and aliases, and downsampled by keeping every
+down-th sample. The polyphase form only evaluates the filter taps that line up
+with nonzero inputs at the outputs that are kept, so each output sample costs
+one short dot product.
+'''
+
+import fractions
+import itertools
+import numpy
+
+from . import instrument
+
+# the largest up or down factor that we will build a polyphase filter for.
+MAX_FACTOR = 1024
+
+# filter design parameters for each quality level: the number of zero
+# crossings of the sinc on each side, the kaiser window beta, and the
+# passband edge as a fraction of the output nyquist frequency.
+QUALITY = {
+    'fast': (8, 6., 0.85),
+    'medium': (16, 8.6, 0.9),
+    'best': (32, 12., 0.94),
+    }
+
+_BANKS = {}
+
+
+def rational_ratio(from_rate, to_rate, max_factor=MAX_FACTOR):
+    '''Express a resampling ratio as a fraction up / down in lowest terms.
+
+    Returns an (up, down) tuple, or None if the ratio cannot be expressed
+    exactly with factors no larger than max_factor.
+    '''
+    ratio = fractions.Fraction(str(to_rate)) / fractions.Fraction(str(from_rate))
+    if max(ratio.numerator, ratio.denominator) > max_factor:
+        return None
+    return ratio.numerator, ratio.denominator
+
+
+def design(up, down, quality='best'):
+    '''Get a (cached) polyphase filter bank for resampling by up / down.
+
+    Returns a tuple (bank, delay). bank is an (up, taps) array whose row p
+    holds filter coefficients h[p], h[p + up], h[p + 2 * up], ...; delay is
+    the group delay of the filter, in upsampled samples.
+    '''
+    key = (up, down, quality)
+    if key not in _BANKS:
+        import scipy.signal
+        zeros, beta, rolloff = QUALITY[quality]
+        factor = max(up, down)
+        delay = zeros * factor
+        h = scipy.signal.firwin(2 * delay + 1, rolloff / factor, window=('kaiser', beta))
+        taps = -(-len(h) // up)
+        h = numpy.concatenate([h * up, numpy.zeros(taps * up - len(h))])
+        bank = h.reshape((taps, up)).T[:, ::-1].copy()
+        bank.flags.writeable = False
+        _BANKS[key] = bank, delay
+    return _BANKS[key]
+
+
+def _apply(bank, down, delay, buffer, start, first, stop):
+    '''Compute outputs [first, stop) from a buffer of input samples.
+
+    Output n is centered on upsampled time n * down + delay, and is the dot
+    product of one row of the filter bank with the inputs that precede it.
+    Outputs that use the same row are spaced up outputs (and down inputs)
+    apart, so for each row the inputs form a strided view of the buffer.
+
+    buffer: A contiguous array of input samples.
+    start: The index in the input stream of buffer[0].
+    '''
+    up, taps = bank.shape
+    output = numpy.empty(max(0, stop - first), buffer.dtype)
+    stride = buffer.strides[0]
+    for r in range(min(up, len(output))):
+        t = (first + r) * down + delay
+        lo = t // up - taps + 1 - start
+        count = (len(output) - r - 1) // up + 1
+        windows = numpy.lib.stride_tricks.as_strided(
+            buffer[lo:], shape=(count, taps), strides=(down * stride, stride))
+        output[r::up] = windows.dot(bank[t % up])
+    return output
+
+
+class Resampler(object):
+    '''A resampler converts a stream of blocks of samples to a new rate.
+
+    Call the resampler with each consecutive block of input, and then call
+    flush() to get the output samples that depend on the end of the input.
+    The concatenated outputs have ceil(n * up / down) samples for n inputs,
+    aligned with the input (the filter delay is compensated).
+    '''
+
+    def __init__(self, from_rate, to_rate, quality='best', dtype=float):
+        '''Initialize a resampler.
+
+        from_rate: The sample rate of the input, in Hz.
+        to_rate: The desired sample rate of the output, in Hz.
+        quality: One of 'fast', 'medium' or 'best'.
+        dtype: The floating point type of the input and output samples.
+        '''
+        ratio = rational_ratio(from_rate, to_rate)
+        if ratio is None:
+            raise ValueError('cannot resample from %s to %s Hz with a polyphase '
+                             'filter' % (from_rate, to_rate))
+        self.up, self.down = ratio
+        self.dtype = numpy.dtype(dtype)
+        self.bank, self.delay = design(self.up, self.down, quality)
+        if self.bank.dtype != self.dtype:
+            self.bank = self.bank.astype(self.dtype)
+        taps = self.bank.shape[1]
+        self._buffer = numpy.zeros(taps, self.dtype)
+        self._start = -taps
+        self._received = 0
+        self._emitted = 0
+
+    def __call__(self, samples):
+        '''Resample a block of input, returning all outputs it completes.'''
+        self._buffer = numpy.concatenate(
+            [self._buffer, numpy.asarray(samples, self.dtype)])
+        self._received += len(samples)
+        stop = -(-(self._received * self.up - self.delay) // self.down)
+        return self._emit(max(stop, self._emitted))
+
+    def flush(self):
+        '''Return the remaining outputs, treating the input as ended.'''
+        stop = -(-self._received * self.up // self.down)
+        if stop > self._emitted:
+            need = ((stop - 1) * self.down + self.delay) // self.up + 1
+            pad = need - self._start - len(self._buffer)
+            if pad > 0:
+                self._buffer = numpy.concatenate(
+                    [self._buffer, numpy.zeros(pad, self.dtype)])
+        return self._emit(max(stop, self._emitted))
+
+    def _emit(self, stop):
+        output = _apply(self.bank, self.down, self.delay,
+                        self._buffer, self._start, self._emitted, stop)
+        self._emitted = stop
+
+        # discard inputs that come before the window of the next output.
+        t = stop * self.down + self.delay
+        drop = t // self.up - self.bank.shape[1] + 1 - self._start
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._start += drop
+        return output
+
+
+def _float_dtype(samples):
+    '''Get the dtype of an array if it is floating point, or float64.'''
+    return samples.dtype if samples.dtype.kind == 'f' else numpy.dtype(float)
+
+
+@instrument.Timer('resample')
+def resample(samples, from_rate, to_rate, quality='best'):
+    '''Resample an array of samples in one anti-aliased polyphase pass.
+
+    samples: A 1-dimensional array of input samples.
+    from_rate: The sample rate of the input, in Hz.
+    to_rate: The desired sample rate of the output, in Hz.
+    quality: One of 'fast', 'medium' or 'best'.
+
+    Returns an array of ceil(len(samples) * to_rate / from_rate) samples, of
+    the same type as the input if that is floating point.
+    '''
+    samples = numpy.asarray(samples)
+    resampler = Resampler(from_rate, to_rate, quality, _float_dtype(samples))
+    return numpy.concatenate([resampler(samples), resampler.flush()])
+
+
+def resample_blocks(blocks, from_rate, to_rate, quality='best'):
+    '''Resample a stream of blocks of samples.
+
+    blocks: An iterable of 1-dimensional arrays of consecutive samples, for
+      example StreamingClip.iter_blocks().
+    from_rate: The sample rate of the input, in Hz.
+    to_rate: The desired sample rate of the output, in Hz.
+    quality: One of 'fast', 'medium' or 'best'.
+
+    Generates a sequence of arrays of resampled output, of the same type as
+    the first block if that is floating point.
+    '''
+    blocks = iter(blocks)
+    try:
+        first = numpy.asarray(next(blocks))
+    except StopIteration:
+        return
+    resampler = Resampler(from_rate, to_rate, quality, _float_dtype(first))
+    for block in itertools.chain([first], blocks):
+        output = resampler(block)
+        if len(output):
+            yield output
+    output = resampler.flush()
+    if len(output):
+        yield output
@@ -23,35 +23,311 @@
 import logging
 import numpy as np
 import os
-import scikits.audiolab
-import scikits.samplerate
-import scipy.signal
 import sys
 
+from . import backends
+from . import filters
+from . import instrument
+from . import resampling
 
-class Clip(object):
+# the maximum number of frames that the window iterators analyze at once.
+FRAME_BLOCK = 1024
+
+# the number of sample frames that streaming readers pull from disk at once.
+BLOCK_FRAMES = 1 << 16
+
+_WINDOWS = {}
+
+# the floating point type for samples decoded from files, when none is given.
+_DEFAULT_DTYPE = np.dtype(np.float64)
+
+
+def default_dtype():
+    '''Get the default floating point type for decoded samples.'''
+    return _DEFAULT_DTYPE
+
+
+def set_default_dtype(dtype):
+    '''Set the default floating point type for decoded samples.
+
+    Clips, streams and mapped clips decode samples from files to this type
+    unless a dtype is passed explicitly. Processing keeps samples in the type
+    they were decoded to, so setting this to float32 halves the memory and
+    bandwidth of a whole pipeline.
+
+    dtype: A numpy floating point type, e.g. numpy.float32.
+
+    Returns the previous default.
+    '''
+    global _DEFAULT_DTYPE
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'f':
+        raise ValueError('%s is not a floating point type' % dtype)
+    previous, _DEFAULT_DTYPE = _DEFAULT_DTYPE, dtype
+    return previous
+
+
+def _resolve_dtype(dtype):
+    '''Get the dtype to use for samples, given an optional explicit dtype.'''
+    return _DEFAULT_DTYPE if dtype is None else np.dtype(dtype)
+
+
+def _get_window(window_type, width, dtype=np.float64):
+    '''Get a (cached) window of the given type, width and dtype.'''
+    key = (window_type, width, np.dtype(dtype).str)
+    if key not in _WINDOWS:
+        import scipy.signal
+        window = scipy.signal.get_window(window_type, width)
+        _WINDOWS[key] = window.astype(dtype)
+    return _WINDOWS[key]
+
+
+def _rfft(frames):
+    '''Compute real FFTs along the last axis, in the precision of the frames.
+
+    numpy computes FFTs in double precision; for single precision frames the
+    coefficients are converted back to complex64 so that they do not double
+    the memory and bandwidth of everything downstream.
+    '''
+    coeffs = np.fft.rfft(frames, axis=-1)
+    return coeffs.astype(np.result_type(frames.dtype, np.complex64), copy=False)
+
+
+def _downmix(block):
+    '''Average a (frames, channels) block down to mono, in place.'''
+    if block.ndim == 1:
+        return block
+    mono = block[:, 0]
+    for c in range(1, block.shape[1]):
+        mono += block[:, c]
+    mono /= block.shape[1]
+    return mono
+
+
+def iter_frame_blocks(blocks, width, hop, offset=0, window_type='hann', block=FRAME_BLOCK):
+    '''Iterate over windowed frames of a sound that arrives in blocks.
+
+    Frames that straddle a block boundary are assembled from the tail of the
+    previous block, so the frames generated are the same as for one
+    contiguous array of samples. Only the samples needed for frames that are
+    not yet complete are retained between blocks.
+
+    Args:
+      blocks: An iterable of 1-dimensional arrays of consecutive samples.
+      width (int): The number of samples in each frame.
+      hop (float): The number of samples between the starts of successive
+        frames.
+
+    Kwargs:
+      offset (int): Offset the first frame from the start of the sound.
+      window_type: A string or tuple describing the type of window to use.
+        See the documentation for `scipy.signal.get_window` for details.
+      block (int): Generate at most this many frames at a time.
+
+    Generates:
+      A sequence of (offsets, frames) tuples, where offsets is an integer
+      array of frame offsets and frames is a (len(offsets), width) array of
+      windowed samples.
+    '''
+    window = None
+    buffer = None
+    start = 0
+    k = 0
+    for samples in blocks:
+        if buffer is None or not len(buffer):
+            buffer = np.asarray(samples)
+        else:
+            buffer = np.concatenate([buffer, samples])
+        if window is None:
+            window = _get_window(window_type, width, buffer.dtype)
+        count = int(np.ceil((start + len(buffer) - width - offset) / float(hop)))
+        if count > k:
+            offsets = (offset + hop * np.arange(k, count)).astype(int)
+            for i in range(0, len(offsets), block):
+                o = offsets[i:i + block]
+                yield o, window * buffer[o[:, None] - start + np.arange(width)]
+            k = count
+        drop = min(len(buffer), int(offset + hop * k) - start)
+        if drop > 0:
+            buffer = buffer[drop:]
+            start += drop
+
+
+def _overlap_add(output, weights, offsets, frames, window):
+    '''Add windowed frames and squared window weights into output arrays.'''
+    width = len(window)
+    lo, hi = offsets[0], offsets[-1] + width
+    index = (offsets[:, None] - lo + np.arange(width)).ravel()
+    output[lo:hi] += np.bincount(index, (window * frames).ravel(), hi - lo)
+    weights[lo:hi] += np.bincount(index, np.tile(window ** 2, len(offsets)), hi - lo)
+
+
+def _normalize_overlap(output, weights, floor=0.1):
+    '''Divide overlap-added output by its window weights, in place.
+
+    Weights are clipped below at a fraction of their maximum, so the sparsely
+    covered samples at the ends of the output fade in and out instead of
+    amplifying whatever the frames contain there.
+    '''
+    if len(weights):
+        output /= np.maximum(weights, floor * weights.max() or 1)
+    return output
+
+
+@instrument.Timer('istft')
+def istft(coeffs, hop, window_type='hann', offset=0, width=None, length=None):
+    '''Invert a short-time Fourier transform by weighted overlap-add.
+
+    Each frame is inverted, multiplied by the synthesis window and added into
+    the output; the output is then divided by the overlap-added squared
+    window. This exactly inverts Clip.stft using the same window and hop,
+    except for the first and last few samples, which are covered by only the
+    tapered ends of the window.
+
+    Args:
+      coeffs: A (frames, bins) array of complex FFT coefficients.
+      hop (float): The number of samples between the starts of successive
+        frames.
+
+    Kwargs:
+      window_type: A string or tuple describing the type of window to use.
+        See the documentation for `scipy.signal.get_window` for details.
+      offset (int): The sample offset of the first frame.
+      width (int): The number of samples in each frame. Defaults to
+        2 * (bins - 1).
+      length (int): The number of samples to return. Defaults to the end of
+        the last frame.
+
+    Returns:
+      A numpy array of samples, single precision if the coefficients are
+      complex64 and double precision otherwise.
+    '''
+    coeffs = np.asarray(coeffs)
+    dtype = coeffs.real.dtype
+    width = width or 2 * (coeffs.shape[-1] - 1)
+    offsets = (offset + hop * np.arange(len(coeffs))).astype(int)
+    if length is None:
+        length = offsets[-1] + width if len(offsets) else 0
+    output = np.zeros(max(length, offsets[-1] + width if len(offsets) else 0), dtype)
+    weights = np.zeros(len(output), dtype)
+    window = _get_window(window_type, width, dtype)
+    for i in range(0, len(coeffs), FRAME_BLOCK):
+        _overlap_add(output, weights, offsets[i:i + FRAME_BLOCK],
+                     np.fft.irfft(coeffs[i:i + FRAME_BLOCK], width, axis=-1),
+                     window)
+    return _normalize_overlap(output, weights)[:length]
+
+
+class _Windowed(object):
+    '''Shared window and FFT iterators for in-memory and streamed sounds.
+
+    Subclasses provide _iter_frame_blocks(width, hop, offset, window_type),
+    which generates (offsets, frames) tuples of windowed frames.
+    '''
+
+    def iter_windows(self, width, offset=0, interval=0.5, window_type='hann'):
+        '''Iterate over consecutive windows of samples in this clip.
+
+        Args:
+          width (int): The number of samples to analyze in each window.
+
+        Kwargs:
+          offset (int): Offset the first window from the start of the sound.
+          interval (float): The proportion of the window width to skip between
+            the start of each successive window. Defaults to half the window
+            width.
+          window_type: A string or tuple describing the type of window to use.
+            See the documentation for `scipy.signal.get_window` for details.
+
+        Generates:
+          A sequence of (sample offset, windowed samples) tuples.
+        '''
+        for offsets, frames in self._iter_frame_blocks(
+                width, width * interval, offset, window_type):
+            for o, samples in zip(offsets, frames):
+                yield int(o), samples
+
+    def iter_fft_coeffs(self, width, offset=0, interval=0.5, window_type='hann'):
+        '''Iterate over consecutive windows of FFT coefficients in this clip.
+
+        Args:
+          width (int): The number of samples to analyze in each window.
+
+        Kwargs:
+          offset (int): Offset the first window from the start of the sound.
+          interval (float): The proportion of the window width to skip between
+            the start of each successive window. Defaults to half the window
+            width.
+          window_type: A string or tuple describing the type of window to use.
+            See the documentation for `scipy.signal.get_window` for details.
+
+        Generates:
+          A sequence of (sample offset, coefficients) tuples.
+        '''
+        for offsets, frames in self._iter_frame_blocks(
+                width, width * interval, offset, window_type):
+            for o, coeffs in zip(offsets, _rfft(frames)):
+                yield int(o), coeffs
+
+    def iter_log_power(self, width, offset=0, interval=0.5, window_type='hann', base=np.e):
+        '''Iterate over consecutive windows of log-power spectra in this clip.
+
+        Args:
+          width (int): The number of samples to analyze in each window.
+
+        Kwargs:
+          offset (int): Offset the first window from the start of the sound.
+          interval (float): The proportion of the window width to skip between
+            the start of each successive window. Defaults to half the window
+            width.
+          window_type: A string or tuple describing the type of window to use.
+            See the documentation for `scipy.signal.get_window` for details.
+
+        Generates:
+          A sequence of (sample offset, spectrum coefficients) tuples.
+        '''
+        for offsets, frames in self._iter_frame_blocks(
+                width, width * interval, offset, window_type):
+            for o, coeffs in zip(offsets, _rfft(frames) ** 2):
+                yield int(o), coeffs
+
+
+class Clip(_Windowed):
     '''A clip is a single piece of sound that's loaded from a file on disk.
 
     Clips are all forced to be mono (1 channel) by averaging each frame across
     all channels that are encountered in the file.
+
+    segment() and split() cut a clip into sub-clips that share its samples.
+    Methods that modify samples in place copy them first if they are shared,
+    so changes to a clip never show up in the clips it shares samples with.
     '''
 
-    def __init__(self, filename='', samples=None, sample_rate=None):
+    # the offset of this clip's first sample in the clip it was cut from.
+    offset = 0
+
+    # the id of the samples array, if it is shared with other clips.
+    _shared = None
+
+    def __init__(self, filename='', samples=None, sample_rate=None, dtype=None):
         '''Initialize this signal by loading sound data from a file.
 
         filename: The name of the file to load sound data from, if any.
         samples: If given, a numpy array containing sound data.
         sample_rate: If samples is not None, this must also be given.
+        dtype: The floating point type for samples decoded from the file.
+          Defaults to default_dtype(). Samples given as an array are converted
+          only if this is given explicitly.
         '''
-        self.samples = np.zeros(1.)
+        self.samples = np.zeros(1, _resolve_dtype(dtype))
         self.sample_rate = sample_rate
 
         self.filename = filename
         if filename:
-            self.load(filename)
+            self.load(filename, dtype=dtype)
         elif samples is not None:
             assert sample_rate > 0
-            self.samples = np.asarray(samples)
+            self.samples = np.asarray(samples, dtype)
             self.sample_rate = sample_rate
 
     def __len__(self):
@@ -72,18 +348,116 @@ class Clip(object):
     def nyquist(self):
         return self.sample_rate / 2.
 
-    def load(self, filename):
+    def astype(self, dtype):
+        '''Get this clip with samples of the given type.
+
+        Returns this clip if its samples already have that type, and a new
+        clip with converted samples otherwise.
+        '''
+        if self.dtype == np.dtype(dtype):
+            return self
+        clip = Clip(samples=self.samples.astype(dtype), sample_rate=self.sample_rate)
+        clip.filename = self.filename
+        clip.offset = self.offset
+        return clip
+
+    def segment(self, start, stop=None, seconds=False):
+        '''Get a sub-clip that shares samples with this clip.
+
+        start: The first sample of the segment. Negative values count back
+          from the end of the clip, as for slicing.
+        stop: The end of the segment (exclusive). Defaults to the end of the
+          clip.
+        seconds: If True, start and stop are times in seconds.
+
+        Returns a Clip whose offset attribute gives its start in the original
+        recording.
+        '''
+        if seconds:
+            start = int(round(start * self.sample_rate))
+            if stop is not None:
+                stop = int(round(stop * self.sample_rate))
+        start, stop, _ = slice(start, stop).indices(len(self))
+        self._share()
+        return self._segment(start, max(start, stop))
+
+    def split(self, boundaries, seconds=False):
+        '''Split this clip into sub-clips that share its samples.
+
+        boundaries: Either a sorted sequence of cut points, which splits the
+          clip into len(boundaries) + 1 consecutive segments, or a sequence of
+          (start, stop) pairs, which gives one segment for each pair.
+        seconds: If True, boundaries are times in seconds.
+
+        Returns a list of Clips.
+        '''
+        bounds = np.asarray(boundaries, float)
+        if seconds:
+            bounds = bounds * self.sample_rate
+        bounds = np.clip(np.round(bounds), 0, len(self)).astype(int)
+        if bounds.ndim == 1:
+            edges = np.concatenate([[0], bounds, [len(self)]])
+            bounds = np.column_stack([edges[:-1], edges[1:]])
+        self._share()
+        return [self._segment(int(a), int(max(a, b))) for a, b in bounds]
+
+    def _share(self):
+        '''Mark the samples of this clip as shared with other clips.'''
+        self._shared = id(self.samples)
+
+    def _segment(self, start, stop):
+        '''Cut a clip that shares samples [start, stop) with this one.'''
+        clip = Clip(samples=self.samples[start:stop], sample_rate=self.sample_rate)
+        clip.filename = self.filename
+        clip.offset = self.offset + start
+        clip._shared = id(clip.samples)
+        return clip
+
+    def _writable_samples(self):
+        '''Get samples that can be modified in place, copying them if shared.'''
+        if self._shared == id(self.samples):
+            self.samples = self.samples.copy()
+            self._shared = None
+        return self.samples
+
+    @classmethod
+    def open_mmap(cls, filename, dtype=None):
+        '''Open an uncompressed WAV file as a memory-mapped clip.
+
+        The returned clip decodes samples lazily from the mapped file, so
+        processes that open the same file share its pages in the OS cache.
+
+        filename: The name of a PCM or floating-point WAV file.
+        dtype: The floating point type to decode samples to. Defaults to
+          default_dtype().
+
+        Returns a MappedClip.
+        '''
+        return MappedClip(filename, dtype)
+
+    def load(self, filename, backend=None, dtype=None):
         '''Load sound data from a file on disk.
 
+        The file is read in blocks that are downmixed as they arrive, so only
+        the mono result and one block of frames are held in memory.
+
         filename: The name of the file to load sound data from.
+        backend: The name of the backend to read with. Defaults to the first
+          available backend that can read the file.
+        dtype: The floating point type to decode samples to. Defaults to
+          default_dtype().
         '''
-        snd = scikits.audiolab.Sndfile(filename)
-        self.samples = snd.read_frames(snd.nframes)
-        while len(self.shape) > 1:
-            self.samples = self.samples.mean(axis=-1)
+        with instrument.Timer('clip.load') as timer:
+            stream = StreamingClip(filename, backend=backend, dtype=dtype)
+            self.samples = np.empty(len(stream), stream.dtype)
+            i = 0
+            for block in stream.iter_blocks():
+                self.samples[i:i + len(block)] = block
+                i += len(block)
+            self.samples = timer.output(self.samples[:i])
 
         self.filename = filename
-        r = self.sample_rate = snd.samplerate
+        r = self.sample_rate = stream.sample_rate
         n = len(self.samples)
         logging.info('%s: read %d frames at %d Hz (%.2f sec)',
                      os.path.basename(self.filename), n, r, float(n) / r)
@@ -94,40 +468,110 @@ class Clip(object):
         Normalizing here means subtracting out the mean and dividing by the
         standard deviation of all samples.
         '''
-        self.samples -= self.samples.mean()
-        self.samples /= self.samples.std()
+        with instrument.Timer('clip.normalize', len(self.samples)):
+            samples = self._writable_samples()
+            samples -= samples.mean()
+            samples /= samples.std()
         logging.info('%s: normalized %d samples',
                      os.path.basename(self.filename), len(self.samples))
 
-    def lowpass_filter(self, freq, order=31):
+    def lowpass_filter(self, freq, order=31, zero_phase=True):
         '''Lowpass filter the clip to eliminate high frequencies.
 
         freq: Construct a lowpass filter with this cutoff frequency.
         order: Build a filter of this order.
+        zero_phase: If True, filter forward and backward so that the output
+          is not delayed. Otherwise, filter once, causally.
         '''
-        b, a = scipy.signal.butter(order, freq / self.nyquist)
-        z = scipy.signal.filtfilt(b, a, self.samples)
-        self.samples = np.asarray(z, self.dtype)
+        self._filter(filters.design(order, freq, self.sample_rate), zero_phase)
         logging.info('%s: lowpass filter at %.2fHz',
                      os.path.basename(self.filename), freq)
 
-    def set_sample_rate(self, sample_rate, method='sinc_best'):
+    def highpass_filter(self, freq, order=31, zero_phase=True):
+        '''Highpass filter the clip to eliminate low frequencies.
+
+        freq: Construct a highpass filter with this cutoff frequency.
+        order: Build a filter of this order.
+        zero_phase: If True, filter forward and backward so that the output
+          is not delayed. Otherwise, filter once, causally.
+        '''
+        self._filter(filters.design(order, freq, self.sample_rate, 'highpass'),
+                     zero_phase)
+        logging.info('%s: highpass filter at %.2fHz',
+                     os.path.basename(self.filename), freq)
+
+    def bandpass_filter(self, low, high, order=16, zero_phase=True):
+        '''Bandpass filter the clip to keep only a band of frequencies.
+
+        low: The lower cutoff frequency of the filter.
+        high: The upper cutoff frequency of the filter.
+        order: Build a filter of this order (the resulting bandpass filter
+          has twice this order).
+        zero_phase: If True, filter forward and backward so that the output
+          is not delayed. Otherwise, filter once, causally.
+        '''
+        self._filter(filters.design(order, (low, high), self.sample_rate, 'bandpass'),
+                     zero_phase)
+        logging.info('%s: bandpass filter at %.2f-%.2fHz',
+                     os.path.basename(self.filename), low, high)
+
+    def _filter(self, sos, zero_phase):
+        '''Apply a filter in second-order sections to the samples.'''
+        import scipy.signal
+        # sosfilt needs a writable copy; cached designs are read-only.
+        sos = np.array(sos, self.dtype)
+        with instrument.Timer('clip.filter') as timer:
+            if zero_phase:
+                z = scipy.signal.sosfiltfilt(sos, self.samples)
+            else:
+                z = scipy.signal.sosfilt(sos, self.samples)
+            self.samples = timer.output(np.asarray(z, self.dtype))
+
+    def set_sample_rate(self, sample_rate, method='auto'):
         '''Set the sample rate for this clip.
 
+        Resampling is anti-aliased, so there is no need to lowpass filter the
+        clip before lowering its sample rate.
+
         sample_rate: The desired sample rate for the clip.
-        method: One of 'linear', 'sinc_fastest', 'sinc_medium', 'sinc_best'.
+        method: One of 'polyphase' (or 'polyphase_fast', 'polyphase_medium')
+          to use a polyphase filter, 'linear', 'sinc_fastest', 'sinc_medium',
+          'sinc_best' to use libsamplerate, or 'auto' (the default) to use a
+          polyphase filter when the ratio of the sample rates is a fraction
+          with small terms, and 'sinc_best' otherwise.
         '''
         resample_ratio = float(sample_rate) / self.sample_rate
         if resample_ratio != 1.:
-            self.samples = np.asarray(
-                scikits.samplerate.resample(self.samples, resample_ratio, method),
-                self.dtype)
+            if method == 'auto':
+                method = 'sinc_best'
+                if resampling.rational_ratio(self.sample_rate, sample_rate):
+                    method = 'polyphase'
+            with instrument.Timer('clip.set_sample_rate') as timer:
+                if method.startswith('polyphase'):
+                    quality = method.partition('_')[2] or 'best'
+                    samples = resampling.resample(
+                        self.samples, self.sample_rate, sample_rate, quality)
+                else:
+                    import scikits.samplerate
+                    samples = scikits.samplerate.resample(
+                        self.samples, resample_ratio, method)
+                self.samples = timer.output(np.asarray(samples, self.dtype))
             r = self.sample_rate = sample_rate
             n = len(self.samples)
             logging.info('%s: resampled to %d frames at %d Hz (%.2f sec)',
                          os.path.basename(self.filename), n, r, float(n) / r)
 
-    def get_window(self, width, offset=0, window_type='hanning'):
+    def iter_blocks(self, block_frames=BLOCK_FRAMES):
+        '''Iterate over consecutive blocks of samples in this clip.
+
+        block_frames: The number of samples in each block.
+
+        Generates a sequence of views into the samples of this clip.
+        '''
+        for i in range(0, len(self), block_frames):
+            yield self[i:i + block_frames]
+
+    def get_window(self, width, offset=0, window_type='hann'):
         '''Get a slice of samples from this clip as a numpy array.
 
         Args:
@@ -141,74 +585,97 @@ class Clip(object):
         Returns:
           A windowed array of sound samples.
         '''
-        window = scipy.signal.get_window(window_type, width)
-        if offset + width < len(self.samples):
-            return window * self.samples[offset:offset + width]
+        window = _get_window(window_type, width, self.dtype)
+        if offset + width < len(self):
+            return window * self[offset:offset + width]
         raise IndexError('%d + %d > %d' % (offset, width, len(self)))
 
-    def iter_windows(self, width, offset=0, interval=0.5, window_type='hanning'):
-        '''Iterate over consecutive windows of samples in this clip.
+    def frame_offsets(self, width, hop, offset=0):
+        '''Get the starting sample offsets of consecutive analysis frames.
 
         Args:
-          width (int): The number of samples to analyze in each window.
+          width (int): The number of samples in each frame.
+          hop (float): The number of samples between the starts of successive
+            frames. Fractional hops are truncated per frame, so the offsets
+            do not drift.
 
         Kwargs:
-          offset (int): Offset the first window from the start of the sound.
-          interval (float): The proportion of the window width to skip between
-            the start of each successive window. Defaults to half the window
-            width.
-          window_type: A string or tuple describing the type of window to use.
-            See the documentation for `scipy.signal.get_window` for details.
+          offset (int): Offset the first frame from the start of the sound.
 
-        Generates:
-          A sequence of (sample offset, windowed samples) tuples.
+        Returns:
+          An integer numpy array of frame offsets.
         '''
-        window = scipy.signal.get_window(window_type, width)
-        interval = width * interval
-        while offset + width < len(self.samples):
-            o = int(offset)
-            yield o, window * self.samples[o:o + width]
-            offset += interval
+        count = int(np.ceil((len(self) - width - offset) / float(hop)))
+        return (offset + hop * np.arange(max(0, count))).astype(int)
 
-    def iter_fft_coeffs(self, width, offset=0, interval=0.5, window_type='hanning'):
-        '''Iterate over consecutive windows of FFT coefficients in this clip.
+    def frames(self, width, hop, offset=0, window_type='hann'):
+        '''Get all windowed frames of samples in this clip as one array.
+
+        When the hop is a whole number of samples, frames are built as a
+        strided view of the clip, so the only copy made is the windowed result.
 
         Args:
-          width (int): The number of samples to analyze in each window.
+          width (int): The number of samples in each frame.
+          hop (float): The number of samples between the starts of successive
+            frames.
 
         Kwargs:
-          offset (int): Offset the first window from the start of the sound.
-          interval (float): The proportion of the window width to skip between
-            the start of each successive window. Defaults to half the window
-            width.
+          offset (int): Offset the first frame from the start of the sound.
           window_type: A string or tuple describing the type of window to use.
             See the documentation for `scipy.signal.get_window` for details.
 
-        Generates:
-          A sequence of (sample offset, coefficients) tuples.
+        Returns:
+          A tuple of (offsets, frames), where offsets is an integer array of
+          frame offsets and frames is a (len(offsets), width) array of
+          windowed samples.
         '''
-        for o, samples in self.iter_windows(width, offset, interval, window_type):
-            yield o, np.fft.rfft(samples)
+        offsets = self.frame_offsets(width, hop, offset)
+        return offsets, _get_window(window_type, width, self.dtype) * self._frame_view(
+            width, hop, offsets)
 
-    def iter_log_power(self, width, offset=0, interval=0.5, window_type='hanning', base=np.e):
-        '''Iterate over consecutive windows of log-power spectra in this clip.
+    def stft(self, width, hop, offset=0, window_type='hann'):
+        '''Compute the short-time Fourier transform of this clip.
 
         Args:
-          width (int): The number of samples to analyze in each window.
+          width (int): The number of samples to analyze in each frame.
+          hop (float): The number of samples between the starts of successive
+            frames.
 
         Kwargs:
-          offset (int): Offset the first window from the start of the sound.
-          interval (float): The proportion of the window width to skip between
-            the start of each successive window. Defaults to half the window
-            width.
+          offset (int): Offset the first frame from the start of the sound.
           window_type: A string or tuple describing the type of window to use.
             See the documentation for `scipy.signal.get_window` for details.
 
-        Generates:
-          A sequence of (sample offset, spectrum coefficients) tuples.
+        Returns:
+          A tuple of (offsets, coeffs), where offsets is an integer array of
+          frame offsets and coeffs is a (len(offsets), width // 2 + 1) array
+          of complex FFT coefficients, complex64 for float32 clips.
         '''
-        for o, samples in self.iter_windows(width, offset, interval, window_type):
-            yield o, np.fft.rfft(samples) ** 2
+        with instrument.Timer('clip.stft') as timer:
+            offsets, frames = self.frames(width, hop, offset, window_type)
+            return offsets, timer.output(_rfft(frames))
+
+    def _frame_view(self, width, hop, offsets):
+        '''Get a (len(offsets), width) array of unwindowed frames.'''
+        if not len(offsets):
+            return np.zeros((0, width), self.dtype)
+        step = int(hop)
+        samples = np.ascontiguousarray(self[offsets[0]:offsets[-1] + width])
+        if hop == step and offsets[-1] - offsets[0] == step * (len(offsets) - 1):
+            stride = samples.strides[0]
+            return np.lib.stride_tricks.as_strided(
+                samples,
+                shape=(len(offsets), width),
+                strides=(step * stride, stride))
+        return samples[offsets[:, None] - offsets[0] + np.arange(width)]
+
+    def _iter_frame_blocks(self, width, hop, offset, window_type, block=FRAME_BLOCK):
+        '''Iterate over blocks of windowed frames, to bound memory use.'''
+        window = _get_window(window_type, width, self.dtype)
+        offsets = self.frame_offsets(width, hop, offset)
+        for i in range(0, len(offsets), block):
+            o = offsets[i:i + block]
+            yield o, window * self._frame_view(width, hop, o)
 
     def play(self):
         '''Play this clip on the current audio device.'''
@@ -217,6 +684,7 @@ class Clip(object):
             c.set_sample_rate(48000)
             c.play()
         else:
+            import scikits.audiolab
             n = abs(self.samples).max()
             scikits.audiolab.play(
                 self.samples / (n if n > 1 else 1), self.sample_rate)
@@ -226,12 +694,14 @@ class Clip(object):
         from matplotlib import pyplot
         return pyplot.specgram(self.samples, *args, **kwargs)
 
-    def save(self, filename):
-        '''Write the data for this clip to a WAV file on disk.'''
-        snd = scikits.audiolab.Sndfile(
-            filename, 'w', scikits.audiolab.Format('wav'), 1, self.sample_rate)
-        snd.write_frames(self.samples)
-        snd.close()
+    def save(self, filename, backend=None):
+        '''Write the data for this clip to a WAV file on disk.
+
+        filename: The name of the file to write.
+        backend: The name of the backend to write with. Defaults to the first
+          available backend that handles the file's extension.
+        '''
+        backends.write_file(filename, self.samples, self.sample_rate, backend)
 
     def rms_error(self, other):
         '''Calculate the RMS error from another clip of the same length.
@@ -244,7 +714,8 @@ class Clip(object):
             raise NotImplemented
         return np.sqrt(((self.samples - other.samples) ** 2).mean())
 
-    def reconstruct_with_fft(self, width, interval=0.5, min_coeff=0.1, phase_distort=0.):
+    def reconstruct_with_fft(self, width, interval=0.5, min_coeff=0.1, phase_distort=0.,
+                             window_type='hann'):
         '''Reconstruct the sound in this clip using threshold-filtered FFT data.
 
         Returns a new clip with the reconstructed sound.
@@ -255,15 +726,180 @@ class Clip(object):
         min_coeff: Set all FFT coefficients less than this magnitude to 0.
         phase_distort: Distort the phase of each coefficient uniformly in the
           interval [-phase_distort, phase_distort].
+        window_type: The type of window to use for analysis and synthesis.
+          See the documentation for `scipy.signal.get_window` for details.
         '''
         pd = phase_distort
+        window = _get_window(window_type, width)
         samples = np.zeros(self.shape, self.dtype)
-        for o, coeffs in self.iter_fft_coeffs(width, interval):
-            for i, c in enumerate(coeffs):
-                if abs(c) < min_coeff:
-                    coeffs[i] = 0
-                else:
-                    t = np.angle(c) + np.random.uniform(-pd, pd)
-                    coeffs[i] = abs(c) * (np.cos(t) + np.sin(t) * 1j)
-            samples[o:o+w] += np.fft.irfft(coeffs)
-        return Clip(samples=samples, sample_rate=self.sample_rate)
+        weights = np.zeros(len(self))
+        for offsets, frames in self._iter_frame_blocks(
+                width, width * interval, 0, window_type):
+            coeffs = np.fft.rfft(frames, axis=-1)
+            magnitude = abs(coeffs)
+            if pd:
+                coeffs *= np.exp(1j * np.random.uniform(-pd, pd, coeffs.shape))
+            coeffs[magnitude < min_coeff] = 0
+            _overlap_add(samples, weights, offsets,
+                         np.fft.irfft(coeffs, width, axis=-1), window)
+        return Clip(samples=_normalize_overlap(samples, weights),
+                    sample_rate=self.sample_rate)
+
+
+class MappedClip(Clip):
+    '''A clip whose samples are mapped from an uncompressed WAV file on disk.
+
+    Indexing, slicing, iterating over blocks and the window and FFT iterators
+    only decode the ranges of the file that they touch. The whole file is
+    decoded into a private array the first time that the samples attribute is
+    used, which happens before any method that modifies the clip.
+    '''
+
+    def __init__(self, filename, dtype=None):
+        '''Map the sample data in a WAV file.
+
+        filename: The name of a PCM or floating-point WAV file.
+        dtype: The floating point type to decode samples to. Defaults to
+          default_dtype().
+        '''
+        self._samples = None
+        self._dtype = _resolve_dtype(dtype)
+        self._open(filename)
+
+    def _open(self, filename):
+        layout = backends.wav_layout(filename)
+        self.filename = filename
+        self.sample_rate = layout['sample_rate']
+        self._raw = np.memmap(filename,
+                              dtype=layout['dtype'],
+                              mode='r',
+                              offset=layout['offset'],
+                              shape=(layout['nframes'], layout['channels']))
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self._samples is None:
+            state['_raw'] = len(self._raw)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._samples is None:
+            frames = self._raw
+            self._open(self.filename)
+            self._raw = self._raw[self.offset:self.offset + frames]
+
+    def _share(self):
+        # the mapped file is read-only, so only decoded samples can be shared.
+        if self._samples is not None:
+            super(MappedClip, self)._share()
+
+    def _segment(self, start, stop):
+        if self._samples is not None:
+            return super(MappedClip, self)._segment(start, stop)
+        clip = MappedClip.__new__(MappedClip)
+        clip.__dict__.update(self.__dict__)
+        clip._raw = self._raw[start:stop]
+        clip.offset = self.offset + start
+        return clip
+
+    def __len__(self):
+        if self._samples is None:
+            return len(self._raw)
+        return len(self._samples)
+
+    def __getitem__(self, slc):
+        if self._samples is None:
+            return self._decode(self._raw[slc])
+        return self._samples[slc]
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            self._samples = self._decode(self._raw)
+            self._raw = None
+        return self._samples
+
+    @samples.setter
+    def samples(self, samples):
+        self._samples = samples
+        self._raw = None
+
+    @property
+    def shape(self):
+        return (len(self), )
+
+    @property
+    def dtype(self):
+        if self._samples is None:
+            return self._dtype
+        return self._samples.dtype
+
+    @property
+    def materialized(self):
+        '''True if this clip has decoded all of its samples into memory.'''
+        return self._samples is not None
+
+    def _decode(self, raw):
+        '''Convert a range of raw mapped frames to mono floating point.'''
+        return backends.decode_pcm(raw, self._dtype, mono=True)
+
+
+class StreamingClip(_Windowed):
+    '''A streaming clip reads sound data from a file on disk in blocks.
+
+    Like a Clip, a streaming clip is forced to be mono by averaging each frame
+    across all channels in the file. Only one block of frames is held in
+    memory at a time, so the window and FFT iterators can process files of
+    any length in bounded memory.
+    '''
+
+    def __init__(self, filename, block_frames=BLOCK_FRAMES, backend=None, dtype=None):
+        '''Open a sound file for streaming.
+
+        filename: The name of the file to stream sound data from.
+        block_frames: Read this many sample frames from the file at a time.
+        backend: The name of the backend to read with. Defaults to the first
+          available backend that can read the file.
+        dtype: The floating point type to decode samples to. Defaults to
+          default_dtype().
+        '''
+        reader = backends.open_file(filename, backend)
+        self.filename = filename
+        self.block_frames = block_frames
+        self.backend = backend
+        self.dtype = _resolve_dtype(dtype)
+        self.sample_rate = reader.sample_rate
+        self.channels = reader.channels
+        self.nframes = reader.nframes
+        reader.close()
+
+    def __len__(self):
+        return self.nframes
+
+    @property
+    def nyquist(self):
+        return self.sample_rate / 2.
+
+    def iter_blocks(self, block_frames=None):
+        '''Iterate over consecutive blocks of mono samples from the file.
+
+        block_frames: The number of frames in each block. Defaults to the
+          block size given when this stream was created.
+
+        Generates a sequence of numpy arrays.
+        '''
+        block_frames = block_frames or self.block_frames
+        reader = backends.open_file(self.filename, self.backend, self.dtype)
+        try:
+            while True:
+                block = reader.read(block_frames)
+                if not len(block):
+                    break
+                yield _downmix(block)
+        finally:
+            reader.close()
+
+    def _iter_frame_blocks(self, width, hop, offset, window_type, block=FRAME_BLOCK):
+        return iter_frame_blocks(
+            self.iter_blocks(), width, hop, offset, window_type, block)
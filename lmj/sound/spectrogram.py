@@ -0,0 +1,104 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Incremental spectral analysis of sound that arrives a block at a time.'''
+
+import numpy
+
+
+class StreamingSpectrogram(object):
+    '''Keep a rolling history of spectra for a stream of samples.
+
+    Push blocks of samples into the spectrogram as they become available.
+    Each push analyzes all frames that the new samples complete in one
+    vectorized step, and stores their magnitude, phase and cepstrum in ring
+    buffers that hold the most recent frames.
+
+    The ring buffers are attributes: magnitude and phase have shape
+    (history, width // 2 + 1) and cepstrum has shape (history, bins // 2 + 1),
+    where bins = width // 2 + 1. The row holding the most recent frame is
+    index; use ordered() to get rows from oldest to newest.
+    '''
+
+    def __init__(self, width, hop=None, history=800, window_type='hann'):
+        '''Initialize the spectrogram.
+
+        width: The number of samples in each analysis frame.
+        hop: The number of samples between successive frames. Defaults to
+          half the frame width.
+        history: Keep the spectra of this many recent frames.
+        window_type: A string or tuple describing the type of window to use.
+          See the documentation for `scipy.signal.get_window` for details.
+        '''
+        self.width = width
+        self.hop = hop or width // 2
+        bins = width // 2 + 1
+        self.magnitude = numpy.zeros((history, bins))
+        self.phase = numpy.zeros((history, bins))
+        self.cepstrum = numpy.zeros((history, bins // 2 + 1))
+        self.index = history - 1
+        self.frames = 0
+        import scipy.signal
+        self._window = scipy.signal.get_window(window_type, width)
+        self._buffer = numpy.zeros(0)
+
+    def __len__(self):
+        return len(self.magnitude)
+
+    def push(self, samples):
+        '''Add samples to the stream, analyzing any frames they complete.
+
+        samples: A 1-dimensional array of the next samples in the stream.
+
+        Returns an array of the ring buffer rows that were updated, oldest
+        first. Only the most recent history frames are analyzed if a push
+        completes more frames than that.
+        '''
+        buffer = numpy.concatenate([self._buffer, samples])
+        count = max(0, (len(buffer) - self.width) // self.hop + 1)
+        self._buffer = buffer[count * self.hop:]
+        if not count:
+            return numpy.zeros(0, int)
+
+        skip = max(0, count - len(self))
+        stride = buffer.strides[0]
+        frames = numpy.lib.stride_tricks.as_strided(
+            buffer[skip * self.hop:],
+            shape=(count - skip, self.width),
+            strides=(self.hop * stride, stride))
+        coeffs = numpy.fft.rfft(self._window * frames, axis=-1)
+        magnitude = abs(coeffs)
+        tiny = numpy.finfo(magnitude.dtype).tiny
+
+        rows = (self.index + 1 + skip + numpy.arange(len(coeffs))) % len(self)
+        self.magnitude[rows] = magnitude
+        self.phase[rows] = numpy.angle(coeffs)
+        self.cepstrum[rows] = abs(numpy.fft.rfft(
+            numpy.log(numpy.maximum(magnitude, tiny)), axis=-1))
+        self.index = rows[-1]
+        self.frames += count
+        return rows
+
+    def ordered(self, history):
+        '''Reorder a ring buffer so that its rows run from oldest to newest.
+
+        history: One of the magnitude, phase or cepstrum ring buffers.
+        '''
+        return history[(self.index + 1 + numpy.arange(len(history))) % len(history)]
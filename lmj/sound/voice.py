@@ -20,96 +20,205 @@
 
 '''Code for synthesizing "voice" sounds under the source-filter model.'''
 
+import itertools
 import numpy
-import scipy.signal
 import numpy.random as rng
 
-from matplotlib import pylab
-
 import sound
 
+# the shape of the formant random walk used by Voice.generate: initial
+# frequency ranges, the typical frequency that steps are biased toward,
+# the softness of that bias, and the maximum step size.
+_FORMANT_RANGES = ([300, 800, 2000, 2500], [700, 2000, 2500, 3500])
+_FORMANT_TARGETS = numpy.array([500., 1500., 2200., 3000.])
+_FORMANT_SCALES = numpy.array([100., 300., 500., 700.])
+_FORMANT_STEPS = numpy.array([30., 50., 70., 90.])
+_FORMANT_AMPLITUDES = (1., 0.9, 0.8, 0.7)
+_FORMANT_BANDWIDTHS = (200., 100., 100., 100.)
+
+
+def _bias(freqs):
+    '''Get the fraction of each formant's step range that lies below zero.
+
+    Formants above their typical frequency are more likely to step down, and
+    formants below it are more likely to step up.
+    '''
+    return 1. / (1. + numpy.exp((_FORMANT_TARGETS - freqs) / _FORMANT_SCALES))
+
 
 class Voice(object):
     '''A voice is a crude source-filter model for speech synthesis.'''
 
+    # the maximum number of harmonic combs to memoize.
+    MAX_COMBS = 1024
+
     def __init__(self, fundamental=200., window_msec=30., sample_rate=16000.):
         self.fundamental = fundamental
         self.window_msec = window_msec
         self.sample_rate = sample_rate
-        self.samples = 1 + sample_rate * window_msec / 2000.
+        self.samples = int(1 + sample_rate * window_msec / 2000.)
         self.nyquist = self.sample_rate / 2.
+        self.freqs = numpy.linspace(0, self.nyquist, self.samples)
+        import scipy.signal
+        self.window = scipy.signal.get_window('hann', 2 * (self.samples - 1))
+        self._combs = {}
 
     def source_spectrum(self, bandwidth=10):
         '''Generate a power spectrum for the vocal tract source.'''
-        slope = max(0.5, min(1.0, 0.07 * numpy.log(bandwidth) + 0.5))
-        f0 = self.fundamental
-        f = numpy.linspace(0, self.nyquist, self.samples)
-        v = numpy.zeros(self.samples)
-        N = 1 + self.nyquist / self.fundamental
-        amplitude = 1.
-        for i in range(1, int(1 + N)):
-            v += amplitude * numpy.exp(-((f - i * f0) / bandwidth) ** 2)
-            amplitude *= slope
-        return v
+        key = (self.fundamental, bandwidth)
+        if key not in self._combs:
+            if len(self._combs) >= self.MAX_COMBS:
+                self._combs.clear()
+            slope = max(0.5, min(1.0, 0.07 * numpy.log(bandwidth) + 0.5))
+            harmonics = numpy.arange(1, int(1 + self.nyquist / self.fundamental) + 1)
+            amplitudes = slope ** (harmonics - 1)
+            peaks = (self.freqs - self.fundamental * harmonics[:, None]) / bandwidth
+            comb = amplitudes.dot(numpy.exp(-peaks ** 2))
+            comb.flags.writeable = False
+            self._combs[key] = comb
+        return self._combs[key]
 
     def filter_spectrum(self, formants):
         '''Generate a power spectrum for the vocal tract filter.
 
         formants: A sequence of (amplitude, center frequency, bandwidth) tuples.
         '''
-        f = numpy.linspace(0, self.nyquist, self.samples)
-        v = numpy.zeros(self.samples)
-        for amplitude, center, bandwidth in formants:
-            v += amplitude * numpy.exp(-((f - center) / bandwidth) ** 2)
-        return v
+        return self.filter_spectra([formants])[0]
+
+    def source_spectra(self, bandwidths):
+        '''Generate source power spectra for a sequence of frames.
+
+        bandwidths: A sequence of harmonic bandwidths, one per frame.
+
+        Returns a (frames, bins) array.
+        '''
+        unique, index = numpy.unique(bandwidths, return_inverse=True)
+        return numpy.array([self.source_spectrum(b) for b in unique])[index]
+
+    def filter_spectra(self, formants):
+        '''Generate filter power spectra for a sequence of frames.
+
+        formants: A sequence, one per frame, of sequences of (amplitude,
+          center frequency, bandwidth) tuples. Each frame must have the same
+          number of formants.
+
+        Returns a (frames, bins) array.
+        '''
+        formants = numpy.asarray(formants, float)
+        amplitude, center, bandwidth = [formants[:, :, i, None] for i in range(3)]
+        return (amplitude * numpy.exp(-((self.freqs - center) / bandwidth) ** 2)).sum(axis=1)
+
+    def render(self, frames):
+        '''Render audio for a finite sequence of frames.
+
+        Source and filter spectra for all frames are built as arrays, inverted
+        with one batched FFT, windowed and overlap-added with 50% overlap.
+        Like simulate(), the output starts halfway through the first frame,
+        so n frames produce n - 1 hops of samples.
+
+        frames: A sequence of (bandwidth, formants) pairs, as generated by
+          generate().
+
+        Returns a numpy array of samples.
+        '''
+        frames = list(frames)
+        return self.synthesize([b for b, _ in frames], [f for _, f in frames])
+
+    def synthesize(self, bandwidths, formants):
+        '''Render audio for arrays of per-frame bandwidths and formants.
+
+        This is render() for trajectories that are already arrays, such as
+        one voice's rows from generate_trajectories().
+
+        bandwidths: A sequence of harmonic bandwidths, one per frame.
+        formants: A sequence, one per frame, of sequences of (amplitude,
+          center frequency, bandwidth) tuples.
+
+        Returns a numpy array of samples.
+        '''
+        if len(bandwidths) < 2:
+            return numpy.zeros(0)
+        spectra = self.source_spectra(bandwidths) * self.filter_spectra(formants)
+        y = self.window * numpy.fft.irfft(spectra, len(self.window), axis=-1)
+        half = len(self.window) // 2
+        return (y[:-1, half:] + y[1:, :half]).ravel()
+
+    def iterblocks(self, frames, block_frames=100):
+        '''Render audio for a (possibly endless) sequence of frames in blocks.
+
+        frames: A sequence of (bandwidth, formants) pairs, as generated by
+          generate().
+        block_frames: Render this many frames at a time.
+
+        Generates a sequence of numpy arrays.
+        '''
+        frames = iter(frames)
+        prev = []
+        while True:
+            block = prev + list(itertools.islice(frames, block_frames))
+            if len(block) < 2:
+                break
+            yield self.render(block)
+            prev = block[-1:]
 
     def simulate(self, formants):
         '''Simulate frames of audio, given a sequence of formants.'''
-        formants = iter(formants)
-        w = scipy.signal.get_window('hanning', 2 * (self.samples - 1))
-
-        def frame(b, f, sw=2., fw=1.):
-            ss = sw * self.log_source_spectrum(b)
-            fs = fw * self.log_filter_spectrum(f)
-            #pylab.clf()
-            #x = numpy.linspace(0, self.nyquist, self.samples)
-            #pylab.plot(x, ss, x, fs)
-            #pylab.plot(x, ss * fs)
-            #pylab.show()
-            return w * numpy.fft.irfft(ss * fs)
-
-        prev, curr = None, frame(*formants.next())
-        for f in formants:
-            prev, curr = curr, frame(*f)
-            for i in range(len(prev) // 2, len(prev)):
-                yield prev[i] + curr[i - len(curr) // 2]
+        for block in self.iterblocks(formants):
+            for sample in block:
+                yield sample
 
     def generate(self):
         '''Generate some random formants.'''
         bw = 10.
-        f1 = rng.uniform(300, 700)
-        f2 = rng.uniform(800, 2000)
-        f3 = rng.uniform(2000, 2500)
-        f4 = rng.uniform(2500, 3500)
-
-        def near(x, t, s):
-            return 1. / (1. + numpy.exp((t - x) / s))
-
+        freqs = rng.uniform(*_FORMANT_RANGES)
         while True:
             if rng.random() < 0.1:
                 bw = rng.gamma(5, 5)
-                r = near(f1, 500, 100)
-                f1 += rng.uniform(-30 * r, 30 * (1 - r))
-                r = near(f2, 1500, 300)
-                f2 += rng.uniform(-50 * r, 50 * (1 - r))
-                r = near(f3, 2200, 500)
-                f3 += rng.uniform(-70 * r, 70 * (1 - r))
-                r = near(f4, 3000, 700)
-                f4 += rng.uniform(-90 * r, 90 * (1 - r))
-            yield (bw, ((1., f1, 200),
-                        (0.9, f2, 100),
-                        (0.8, f3, 100),
-                        (0.7, f4, 100)))
+                r = _bias(freqs)
+                freqs = freqs + rng.uniform(-_FORMANT_STEPS * r, _FORMANT_STEPS * (1 - r))
+            yield (bw, tuple(zip(_FORMANT_AMPLITUDES, freqs, _FORMANT_BANDWIDTHS)))
+
+    def generate_trajectories(self, n_frames, n_voices=1):
+        '''Generate random formant trajectories for many voices at once.
+
+        The trajectories follow the same random walk as generate(): on each
+        frame, with probability 0.1, the source bandwidth is redrawn and each
+        formant takes a uniform step biased back toward its typical value.
+        Instead of stepping frame by frame, this draws all of the update
+        events up front, runs the walk once per event round for all voices
+        in parallel, and then expands the walk to frames with a cumulative
+        count of events.
+
+        n_frames: Generate this many frames per voice.
+        n_voices: Generate trajectories for this many independent voices.
+
+        Returns a pair of arrays (bandwidths, formants), shaped (n_voices,
+        n_frames) and (n_voices, n_frames, 4, 3). The formants are (amplitude,
+        center frequency, bandwidth) triples, so bandwidths[i] and formants[i]
+        can be passed straight to synthesize().
+        '''
+        events = rng.random_sample((n_voices, n_frames)) < 0.1
+        rounds = events.sum(axis=1).max() if n_frames else 0
+
+        # walk[k] holds each voice's state after its k-th update event.
+        bws = numpy.empty((rounds + 1, n_voices))
+        walk = numpy.empty((rounds + 1, n_voices, 4))
+        bws[0] = 10.
+        walk[0] = rng.uniform(*_FORMANT_RANGES, size=(n_voices, 4))
+        if rounds:
+            bws[1:] = rng.gamma(5, 5, size=(rounds, n_voices))
+            steps = rng.random_sample((rounds, n_voices, 4))
+        for k in range(rounds):
+            r = _bias(walk[k])
+            walk[k + 1] = walk[k] + _FORMANT_STEPS * (steps[k] - r)
+
+        index = numpy.cumsum(events, axis=1)
+        voices = numpy.arange(n_voices)[:, None]
+        formants = numpy.empty((n_voices, n_frames, 4, 3))
+        formants[..., 0] = _FORMANT_AMPLITUDES
+        formants[..., 1] = walk[index, voices]
+        formants[..., 2] = _FORMANT_BANDWIDTHS
+        return bws[index, voices], formants
 
 
 if __name__ == '__main__':
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Benchmark the hot paths in lmj.sound on synthetic sounds.
+
+Fixtures are generated locally (a tone in pink noise, written as 16-bit WAV
+files to a temporary directory), so this runs offline. Each case is timed at
+every combination of --durations, --sample-rates and, for cases that read
+files, --channels. For each run we report throughput in samples per second
+and, where tracemalloc is available, the peak memory allocated by the case.
+For each case we also report a scaling exponent: the slope of log time
+against log samples across durations, which is 1.0 for linear code.
+
+With --imports, we also import numpy and then lmj.sound in fresh
+interpreters, as each pool worker does, and report the import time and the
+peak resident memory of the interpreter.
+
+Use --save to record a baseline, and --compare to flag cases whose throughput
+dropped by more than --tolerance relative to a saved baseline. The script
+exits with status 1 if any case regressed.
+'''
+
+import os
+import re
+import sys
+import json
+import wave
+import timeit
+import shutil
+import logging
+import optparse
+import platform
+import tempfile
+import subprocess
+import collections
+
+import numpy
+import lmj.sound
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+FLAGS = optparse.OptionParser()
+FLAGS.add_option('-d', '--durations', default='1,4,16', metavar='S,S,...',
+                 help='benchmark sounds lasting S seconds (1,4,16)')
+FLAGS.add_option('-r', '--sample-rates', default='16000,44100', metavar='N,N,...',
+                 help='benchmark sounds sampled at N Hz (16000,44100)')
+FLAGS.add_option('-c', '--channels', default='1,2', metavar='N,N,...',
+                 help='benchmark file reads with N channels (1,2)')
+FLAGS.add_option('-n', '--repeat', type=int, default=3, metavar='N',
+                 help='report the best of N runs of each case (3)')
+FLAGS.add_option('-k', '--select', metavar='REGEX',
+                 help='only run cases whose names match REGEX')
+FLAGS.add_option('', '--no-memory', action='store_true',
+                 help='do not measure peak memory')
+FLAGS.add_option('', '--save', metavar='FILE',
+                 help='save results as a JSON baseline in FILE')
+FLAGS.add_option('', '--compare', metavar='FILE',
+                 help='compare results against the JSON baseline in FILE')
+FLAGS.add_option('', '--tolerance', type=float, default=0.1, metavar='R',
+                 help='flag cases more than R slower than the baseline (0.1)')
+FLAGS.add_option('', '--imports', action='store_true',
+                 help='also measure the time and memory taken to import lmj.sound')
+FLAGS.add_option('', '--list', action='store_true',
+                 help='list the benchmark cases and exit')
+
+
+Fixture = collections.namedtuple(
+    'Fixture', 'filename samples sample_rate channels duration')
+
+CASES = collections.OrderedDict()
+
+
+def case(name, files=False):
+    '''Register a benchmark case.
+
+    The decorated function takes a Fixture and returns a callable that does
+    the work to be timed; anything done before returning is setup and is not
+    timed.
+
+    name: The name of the case.
+    files: If True, the case reads the fixture file, so it is run for each
+      channel count. Otherwise it only sees the mono fixture samples.
+    '''
+    def decorate(setup):
+        CASES[name] = (setup, files)
+        return setup
+    return decorate
+
+
+def consume(iterable):
+    '''Exhaust an iterable, discarding its values.'''
+    collections.deque(iterable, maxlen=0)
+
+
+def fft_width(fx):
+    '''Get a 30ms analysis window (rounded to an even width) for a fixture.'''
+    return 2 * int(0.015 * fx.sample_rate)
+
+
+@case('load', files=True)
+def load(fx):
+    return lambda: lmj.sound.Clip(fx.filename)
+
+
+@case('open_mmap', files=True)
+def open_mmap(fx):
+    return lambda: lmj.sound.Clip.open_mmap(fx.filename).samples
+
+
+@case('stream_fft', files=True)
+def stream_fft(fx):
+    width = fft_width(fx)
+    return lambda: consume(lmj.sound.StreamingClip(fx.filename).iter_fft_coeffs(width))
+
+
+@case('set_sample_rate')
+def set_sample_rate(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    def run():
+        clip.samples, clip.sample_rate = fx.samples, fx.sample_rate
+        clip.set_sample_rate(fx.sample_rate // 2)
+    return run
+
+
+@case('lowpass_filter')
+def lowpass_filter(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    def run():
+        clip.samples = fx.samples
+        clip.lowpass_filter(fx.sample_rate / 4.)
+    return run
+
+
+@case('iter_fft_coeffs')
+def iter_fft_coeffs(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    width = fft_width(fx)
+    return lambda: consume(clip.iter_fft_coeffs(width))
+
+
+@case('stft')
+def stft(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    width = fft_width(fx)
+    return lambda: clip.stft(width, width // 2)
+
+
+@case('istft')
+def istft(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    width = fft_width(fx)
+    _, coeffs = clip.stft(width, width // 2)
+    return lambda: lmj.sound.istft(coeffs, width // 2, length=len(clip))
+
+
+@case('reconstruct_with_fft')
+def reconstruct_with_fft(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    return lambda: clip.reconstruct_with_fft(fft_width(fx))
+
+
+@case('mfcc')
+def mfcc(fx):
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    width = fft_width(fx)
+    _, coeffs = clip.stft(width, width // 2)
+    return lambda: lmj.sound.features.mfcc(coeffs, fx.sample_rate, width)
+
+
+def repertoire(fx, count=8):
+    '''Build a repertoire of short clips cut from a fixture.'''
+    size = min(len(fx.samples), fx.sample_rate // 2)
+    starts = numpy.linspace(0, len(fx.samples) - size, count).astype(int)
+    return lmj.sound.Repertoire(
+        lmj.sound.Clip(samples=fx.samples[s:s + size], sample_rate=fx.sample_rate)
+        for s in starts)
+
+
+@case('repertoire_render')
+def repertoire_render(fx):
+    rep = repertoire(fx)
+    def run():
+        total = 0
+        for block in rep.render(rep.itercontrols(min_coeff=1.), control_rate=10.):
+            total += len(block)
+            if total >= len(fx.samples):
+                break
+    return run
+
+
+@case('repertoire_chain')
+def repertoire_chain(fx):
+    rep = repertoire(fx)
+    return lambda: next(rep.chain_blocks(block_size=len(fx.samples)))
+
+
+@case('pink_noise')
+def pink_noise(fx):
+    return lambda: lmj.sound.noise.pink(len(fx.samples))
+
+
+@case('gammachirp_kernel')
+def gammachirp_kernel(fx):
+    tone = lmj.sound.Gammachirp(1000., chirp=1.)
+    t = numpy.arange(1, len(fx.samples) + 1) / float(fx.sample_rate)
+    return lambda: tone(t)
+
+
+@case('gammatone_filterbank')
+def gammatone_filterbank(fx):
+    bank = lmj.sound.GammatoneFilterbank(
+        lmj.sound.erb_space(100., 0.4 * fx.sample_rate, 16), fx.sample_rate)
+    clip = lmj.sound.Clip(samples=fx.samples, sample_rate=fx.sample_rate)
+    return lambda: bank.cochleagram(clip, decimate=fx.sample_rate // 100)
+
+
+def synthesize(duration, sample_rate, channels, seed=1):
+    '''Generate a tone in pink noise, with a different tone per channel.'''
+    numpy.random.seed(seed)
+    n = int(duration * sample_rate)
+    t = numpy.arange(n) / float(sample_rate)
+    noise = lmj.sound.noise.pink((channels, n))
+    noise /= abs(noise).max()
+    tones = numpy.sin(2 * numpy.pi * 440. * (1 + numpy.arange(channels))[:, None] * t)
+    return 0.5 * tones + 0.25 * noise
+
+
+def write_wav(filename, samples, sample_rate):
+    '''Write a (channels, frames) array of samples to a 16-bit WAV file.'''
+    pcm = (numpy.clip(samples, -1, 1) * 32767).astype('<i2')
+    handle = wave.open(filename, 'wb')
+    try:
+        handle.setnchannels(len(samples))
+        handle.setsampwidth(2)
+        handle.setframerate(int(sample_rate))
+        handle.writeframes(pcm.T.tobytes())
+    finally:
+        handle.close()
+
+
+def fixtures(root, durations, sample_rates, channels):
+    '''Generate fixtures for every combination of the given parameters.'''
+    for d in durations:
+        for r in sample_rates:
+            for c in channels:
+                samples = synthesize(d, r, c)
+                filename = os.path.join(root, '%gs-%dhz-%dch.wav' % (d, r, c))
+                write_wav(filename, samples, r)
+                yield Fixture(filename, samples.mean(axis=0), r, c, d)
+
+
+def measure(setup, fx, repeat, memory):
+    '''Time one case on one fixture.
+
+    Returns a dict containing the best time in seconds over repeat runs and,
+    if memory is True, the peak bytes allocated during one more run.
+    '''
+    run = setup(fx)
+    result = dict(seconds=min(timeit.repeat(run, number=1, repeat=repeat)))
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+IMPORT_SCRIPT = '''
+import json, resource, sys, timeit
+start = timeit.default_timer()
+import %s
+seconds = timeit.default_timer() - start
+json.dump(dict(seconds=seconds,
+               rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+          sys.stdout)
+'''
+
+
+def measure_import(module, repeat):
+    '''Import a module in fresh interpreters, as a pool worker would.
+
+    Returns a dict containing the best import time in seconds and the
+    smallest peak resident set size of the interpreter, in bytes.
+    '''
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', IMPORT_SCRIPT % module])
+        runs.append(json.loads(output.decode('utf-8')))
+    # ru_maxrss is in kilobytes on linux, but in bytes on os x.
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return dict(seconds=min(r['seconds'] for r in runs),
+                peak_bytes=scale * min(r['rss'] for r in runs))
+
+
+def scaling(results):
+    '''Fit the exponent of time against samples for each case and sound type.
+
+    results: A dict mapping result keys to result dicts.
+
+    Returns a dict mapping (case, sample rate, channels) to exponents.
+    '''
+    groups = collections.defaultdict(list)
+    for r in results.values():
+        groups[r['case'], r['sample_rate'], r['channels']].append(r)
+    curves = {}
+    for key, rs in groups.items():
+        if len(rs) > 1:
+            x = numpy.log([r['samples'] for r in rs])
+            y = numpy.log([max(r['seconds'], 1e-9) for r in rs])
+            curves[key] = numpy.polyfit(x, y, 1)[0]
+    return curves
+
+
+def compare(results, baseline, tolerance):
+    '''Compare results against a baseline, and log any regressions.
+
+    Returns the number of results that regressed.
+    '''
+    regressed = 0
+    for key in sorted(set(results) & set(baseline)):
+        ratio = results[key]['throughput'] / baseline[key]['throughput']
+        if ratio < 1 - tolerance:
+            regressed += 1
+            logging.warning('%s: REGRESSION, %.2fx baseline throughput', key, ratio)
+        elif ratio > 1 + tolerance:
+            logging.info('%s: %.2fx baseline throughput', key, ratio)
+    missing = len(set(baseline) - set(results))
+    if missing:
+        logging.info('%d baseline results were not run', missing)
+    return regressed
+
+
+def main(opts):
+    selected = [name for name in CASES
+                if not opts.select or re.search(opts.select, name)]
+    durations = [float(x) for x in opts.durations.split(',')]
+    sample_rates = [int(x) for x in opts.sample_rates.split(',')]
+    channels = [int(x) for x in opts.channels.split(',')]
+    memory = tracemalloc is not None and not opts.no_memory
+
+    results = collections.OrderedDict()
+    for module in ('numpy', 'lmj.sound') if opts.imports else ():
+        key = 'import/%s' % module
+        result = measure_import(module, opts.repeat)
+        result.update(case='import', sample_rate=0, channels=0, duration=0,
+                      samples=1, throughput=1. / max(result['seconds'], 1e-9))
+        results[key] = result
+        logging.info('%-40s %10.4fs %10.1fMB rss', key,
+                     result['seconds'], result['peak_bytes'] / 1e6)
+
+    root = tempfile.mkdtemp(prefix='lmj-sound-bench-')
+    try:
+        for fx in fixtures(root, durations, sample_rates, channels):
+            for name in selected:
+                setup, files = CASES[name]
+                if fx.channels != channels[0] and not files:
+                    continue
+                key = '%s/%dhz/%dch/%gs' % (
+                    name, fx.sample_rate, fx.channels if files else 1, fx.duration)
+                try:
+                    result = measure(setup, fx, opts.repeat, memory)
+                except Exception as e:
+                    logging.error('%s: %s: %s', key, e.__class__.__name__, e)
+                    continue
+                samples = len(fx.samples) * (fx.channels if files else 1)
+                result.update(case=name,
+                              sample_rate=fx.sample_rate,
+                              channels=fx.channels if files else 1,
+                              duration=fx.duration,
+                              samples=samples,
+                              throughput=samples / max(result['seconds'], 1e-9))
+                results[key] = result
+                logging.info('%-40s %10.4fs %12.0f samples/s %10s', key,
+                             result['seconds'], result['throughput'],
+                             '%.1fMB' % (result['peak_bytes'] / 1e6) if memory else '')
+    finally:
+        shutil.rmtree(root)
+
+    for (name, rate, chans), exponent in sorted(scaling(results).items()):
+        logging.info('%s/%dhz/%dch: time ~ samples^%.2f', name, rate, chans, exponent)
+
+    if opts.save:
+        handle = open(opts.save, 'w')
+        try:
+            json.dump(dict(python=platform.python_version(),
+                           numpy=numpy.__version__,
+                           platform=platform.platform(),
+                           results=results),
+                      handle, indent=1, sort_keys=True)
+        finally:
+            handle.close()
+
+    if opts.compare:
+        handle = open(opts.compare)
+        try:
+            baseline = json.load(handle)['results']
+        finally:
+            handle.close()
+        return compare(results, baseline, opts.tolerance)
+
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.DEBUG,
+        format='%(levelname).1s %(asctime)s [%(module)s:%(lineno)d] %(message)s')
+    opts, args = FLAGS.parse_args()
+    if opts.list:
+        print('\n'.join(CASES))
+        sys.exit()
+    sys.exit(main(opts) and 1)
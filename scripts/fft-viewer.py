@@ -23,7 +23,6 @@
 '''A glumpy-based FFT viewer.'''
 
 import sys
-import math
 import time
 import numpy
 import glumpy
@@ -58,51 +57,43 @@ if __name__ == '__main__':
     start = time.time()
 
     clip = lmj.sound.load_clip(args[0], opts.sample_rate)
-    samples = int(1 + clip.sample_rate * opts.window_msec / 2000.0)
+    width = int(clip.sample_rate * opts.window_msec / 1000.0)
+    analyzer = lmj.sound.StreamingSpectrogram(width, history=opts.history)
 
-    phase = numpy.zeros((opts.history, samples), 'f')
-    spectrum = numpy.zeros((opts.history, samples), 'f')
-    cepstrum = numpy.zeros((opts.history, samples / 2 + 1), 'f')
+    phase = numpy.zeros(analyzer.phase.shape, 'f')
+    spectrum = numpy.zeros(analyzer.magnitude.shape, 'f')
+    cepstrum = numpy.zeros(analyzer.cepstrum.shape, 'f')
 
-    index = 0
+    pushed = 0
 
     window = glumpy.Figure()
     player = None
 
+    def power(values, scale=1):
+        m = opts.min_power + scale
+        return numpy.log(1 + numpy.clip(values, m, m + opts.range) - m) / numpy.log(opts.range)
+
     @window.timer(1000.0 / opts.window_msec)
     def update(dt):
-        global index, phase, spectrum, cepstrum, player
-
-        now = time.time()
+        global pushed, player
 
-        signal = clip.get_window(now - start + opts.latency_msec / 1000.0,
-                                 opts.window_msec / 1000.0)
-
-        if signal is None:
+        if pushed >= len(clip):
             if player:
                 player.terminate()
             sys.exit()
 
-        def idx(offset):
-            return (index + offset) % len(phase)
-
-        index = idx(1)
-
-        def power(scale=1):
-            m = opts.min_power + scale
-            return numpy.clip(abs(coeffs), m, m + opts.range) - m
-
-        coeffs = numpy.fft.rfft(signal)
-        spectrum[index, ::-1] = numpy.log(1 + power()) / numpy.log(opts.range)
-        spectrum[idx(1), :] = spectrum[idx(2), :] = 0
-
-        angles = numpy.array([math.atan2(c.imag, c.real) for c in coeffs])
-        phase[index, ::-1] = (angles + numpy.pi) / (2 * numpy.pi)
-        phase[idx(1), :] = phase[idx(2), :] = 0
-
-        coeffs = numpy.fft.rfft(numpy.log(abs(coeffs)))
-        cepstrum[index, ::-1] = numpy.log(1 + power(10)) / numpy.log(opts.range)
-        cepstrum[idx(1), :] = cepstrum[idx(2), :] = 0
+        now = time.time() - start + opts.latency_msec / 1000.0
+        target = min(len(clip), int(now * clip.sample_rate))
+        rows = analyzer.push(clip[pushed:target])
+        pushed = max(pushed, target)
+        if not len(rows):
+            return
+
+        blank = (rows[-1] + numpy.array([1, 2])) % len(analyzer)
+        spectrum[rows, ::-1] = power(analyzer.magnitude[rows])
+        phase[rows, ::-1] = (analyzer.phase[rows] + numpy.pi) / (2 * numpy.pi)
+        cepstrum[rows, ::-1] = power(analyzer.cepstrum[rows], 10)
+        spectrum[blank] = phase[blank] = cepstrum[blank] = 0
 
     kwargs = dict(interpolation='bicubic',
                   colormap=glumpy.colormap.IceAndFire,
@@ -26,23 +26,18 @@ import os
 import sys
 import logging
 import optparse
-import multiprocessing
 
-import lmj.sound
+import lmj.sound.batch
 
 FLAGS = optparse.OptionParser()
 FLAGS.add_option('-r', '--sample-rate', default=22050, type=float, metavar='N',
                  help='resample all sounds to N Hz before processing (22050)')
 FLAGS.add_option('-o', '--output', metavar='DIR',
                  help='save resampled sounds to DIR (resampled-N)')
-
-
-SAMPLE_RATE = None
-OUTPUT = None
-
-def resample(filename):
-    lmj.sound.load_clip(filename, SAMPLE_RATE).save(
-        os.path.join(OUTPUT, os.path.basename(filename)))
+FLAGS.add_option('-j', '--processes', type=int, metavar='N',
+                 help='resample sounds in N processes (one per cpu)')
+FLAGS.add_option('', '--max-mbytes', type=float, metavar='N',
+                 help='hold at most about N MB of sound in flight (no limit)')
 
 
 if __name__ == '__main__':
@@ -51,8 +46,16 @@ if __name__ == '__main__':
         level=logging.DEBUG,
         format='%(levelname).1s %(asctime)s [%(module)s:%(lineno)d] %(message)s')
     opts, args = FLAGS.parse_args()
-    SAMPLE_RATE = opts.sample_rate
-    OUTPUT = opts.output or 'resampled-%d' % opts.sample_rate
-    if not os.path.isdir(OUTPUT):
-        os.makedirs(OUTPUT)
-    multiprocessing.Pool().map(resample, args)
+    output = opts.output or 'resampled-%d' % opts.sample_rate
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    pipeline = lmj.sound.batch.Pipeline(
+        sample_rate=opts.sample_rate,
+        steps=[lmj.sound.batch.SaveClip(output)])
+    failed = 0
+    for result in lmj.sound.batch.process(
+            args, pipeline,
+            processes=opts.processes,
+            max_bytes=opts.max_mbytes and opts.max_mbytes * 1e6):
+        failed += result.error is not None
+    sys.exit(failed and 1)
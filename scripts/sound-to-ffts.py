@@ -20,13 +20,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import lmj.sound
+import lmj.sound.batch
 import logging
 import numpy
 import optparse
-import os
 import sys
-import time
 
 FLAGS = optparse.OptionParser()
 FLAGS.add_option('-r', '--sample-rate', type=int, default=22050, metavar='N',
@@ -41,48 +39,61 @@ FLAGS.add_option('-p', '--power', action='store_true',
                  help='output the absolute value of the result')
 FLAGS.add_option('-c', '--cepstrum', action='store_true',
                  help='output the cepstrum coefficients')
+FLAGS.add_option('-j', '--processes', type=int, metavar='N',
+                 help='process files in N processes (one per cpu)')
+FLAGS.add_option('-o', '--output', default='ffts.feat', metavar='FILE',
+                 help='write frames to feature file FILE (ffts.feat)')
 
 
-def encode(x):
-    return x.tostring().encode('base64').replace('\n', '')
+class Transform(object):
+    '''Compute the requested FFT features for all frames of a clip.'''
 
+    def __init__(self, opts):
+        self.opts = opts
 
-def process(opts, filename):
-    clip = lmj.sound.load_clip(filename, opts.sample_rate)
-
-    window_sec = opts.window_msec / 1000.
-    interval_sec = opts.interval_msec / 1000.
-    windows = (clip.length_sec - window_sec) / interval_sec
-
-    fft_coeffs = clip.iter_fft_coeffs(window_sec, interval_sec)
-
-    count = 0
-    start = time.time()
-    for count, (_, coeffs) in enumerate(fft_coeffs):
-        if opts.cepstrum:
-            coeffs = numpy.fft.rfft(numpy.log(abs(coeffs) ** 2))
-        if opts.power:
+    def __call__(self, clip):
+        width = int(clip.sample_rate * self.opts.window_msec / 1000.)
+        hop = int(clip.sample_rate * self.opts.interval_msec / 1000.)
+        _, coeffs = clip.stft(width, hop)
+        if self.opts.cepstrum:
+            coeffs = numpy.fft.rfft(numpy.log(abs(coeffs) ** 2), axis=-1)
+        if self.opts.power:
             coeffs = abs(coeffs) ** 2
-        if opts.log:
+        if self.opts.log:
             coeffs = numpy.log(coeffs)
-
-        print encode(coeffs)
-
-        if count and not count % 10000:
-            logging.debug('%s: %dk of %dk windows processed in %dms',
-                          os.path.basename(filename),
-                          count / 1000., windows / 1000.,
-                          1000 * (time.time() - start))
-    return count
+        return coeffs
 
 
 def main(opts, filenames):
-    for filename in filenames:
-        start = time.time()
-        windows = process(opts, filename)
-        logging.info('%s: %d windows processed in %dms',
-                     os.path.basename(filename),
-                     windows, 1000 * (time.time() - start))
+    '''Write features for a list of sound files, returning the failure count.'''
+    pipeline = lmj.sound.batch.Pipeline(
+        sample_rate=opts.sample_rate, steps=[Transform(opts)])
+    transform = 'cepstrum' if opts.cepstrum else 'fft'
+    if opts.power:
+        transform += '-power'
+    if opts.log:
+        transform += '-log'
+    metadata = dict(sample_rate=opts.sample_rate,
+                    window_msec=opts.window_msec,
+                    interval_msec=opts.interval_msec,
+                    width=int(opts.sample_rate * opts.window_msec / 1000.),
+                    hop=int(opts.sample_rate * opts.interval_msec / 1000.),
+                    window='hann',
+                    transform=transform)
+    failed = 0
+    with lmj.sound.FeatureWriter(opts.output, metadata) as writer:
+        for result in lmj.sound.batch.process(
+                filenames, pipeline, processes=opts.processes):
+            if result.error is not None:
+                failed += 1
+                continue
+            writer.append(result.filename, result.value)
+            logging.info('%s: %d windows processed in %dms',
+                         result.filename, len(result.value),
+                         1000 * result.seconds)
+    if failed:
+        logging.error('%d of %d files failed', failed, len(filenames))
+    return failed
 
 
 if __name__ == '__main__':
@@ -90,4 +101,4 @@ if __name__ == '__main__':
         stream=sys.stderr,
         level=logging.DEBUG,
         format='%(levelname).1s %(asctime)s %(message)s')
-    main(*FLAGS.parse_args())
+    sys.exit(main(*FLAGS.parse_args()) and 1)
@@ -0,0 +1,107 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.backends.'''
+
+import numpy
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from lmj.sound import backends
+
+
+class FallbackReader(object):
+    sample_rate = 8000
+    channels = 1
+    nframes = 0
+
+    def read(self, n):
+        return numpy.zeros((0, 1))
+
+    def close(self):
+        pass
+
+
+class FallbackBackend(backends.Backend):
+    '''Open any file as an empty sound.'''
+
+    name = 'test-fallback'
+
+    def open(self, filename, dtype=float):
+        return FallbackReader()
+
+
+class TestOpenFile(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        # use only the wave backend and the fallback, whatever is installed.
+        self.registry = backends._BACKENDS[:]
+        backends._BACKENDS[:] = [backends.WaveBackend(), FallbackBackend()]
+
+    def tearDown(self):
+        backends._BACKENDS[:] = self.registry
+        shutil.rmtree(self.root)
+
+    def write(self, name, data):
+        filename = os.path.join(self.root, name)
+        with open(filename, 'wb') as handle:
+            handle.write(data)
+        return filename
+
+    def assertFallsBack(self, data):
+        filename = self.write('bad.wav', data)
+        self.assertRaises(ValueError, backends.wav_layout, filename)
+        reader = backends.open_file(filename)
+        self.assertIsInstance(reader, FallbackReader)
+        self.assertRaises(IOError, backends.open_file, filename, 'wave')
+
+    def test_empty(self):
+        self.assertFallsBack(b'')
+
+    def test_truncated_header(self):
+        self.assertFallsBack(b'RIFF\0\0')
+
+    def test_garbage_header(self):
+        self.assertFallsBack(b'this is not a sound file at all')
+
+    def test_truncated_fmt(self):
+        self.assertFallsBack(b'RIFF\0\0\0\0WAVEfmt \x10\0\0\0\x01\0')
+
+    def test_valid(self):
+        samples = numpy.array([0, 16384, -16384, 32767], '<i2')
+        fmt = struct.pack('<HHIIHH', 1, 1, 8000, 16000, 2, 16)
+        data = (b'RIFF' + struct.pack('<I', 36 + 8) + b'WAVE' +
+                b'fmt ' + struct.pack('<I', 16) + fmt +
+                b'data' + struct.pack('<I', 8) + samples.tobytes())
+        reader = backends.open_file(self.write('good.wav', data))
+        try:
+            self.assertEqual(reader.sample_rate, 8000)
+            numpy.testing.assert_allclose(
+                reader.read(4).ravel(), samples / 32768.)
+        finally:
+            reader.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
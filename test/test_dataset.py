@@ -0,0 +1,69 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.dataset.'''
+
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+import lmj.sound
+
+
+class TestPackClips(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root, 'clips.feat')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def clips(self):
+        for i, n in enumerate((100, 250)):
+            clip = lmj.sound.Clip(samples=numpy.linspace(-1, 1, n), sample_rate=8000)
+            clip.filename = 'clip%d.wav' % i
+            yield clip
+
+    def test_samples(self):
+        lmj.sound.pack_clips(self.filename, self.clips())
+        features = lmj.sound.FeatureFile(self.filename)
+        self.assertEqual(features.names, ['clip0.wav', 'clip1.wav'])
+        for clip in self.clips():
+            numpy.testing.assert_array_equal(
+                features[clip.filename].ravel(), clip.samples)
+
+    def test_sample_rate(self):
+        lmj.sound.pack_clips(self.filename, self.clips())
+        features = lmj.sound.FeatureFile(self.filename)
+        self.assertEqual(features.metadata['sample_rate'], 8000)
+
+    def test_metadata(self):
+        metadata = dict(source='test')
+        lmj.sound.pack_clips(self.filename, self.clips(), metadata)
+        features = lmj.sound.FeatureFile(self.filename)
+        self.assertEqual(features.metadata, dict(source='test', sample_rate=8000))
+        self.assertEqual(metadata, dict(source='test'))
+
+
+if __name__ == '__main__':
+    unittest.main()
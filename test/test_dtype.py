@@ -0,0 +1,166 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests that float32 processing stays close to the float64 path.
+
+Each test runs the same operations on float64 and float32 data and bounds
+the difference between the results, relative to the largest float64 value.
+'''
+
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+import lmj.sound
+
+# the largest relative difference we accept between float32 and float64
+# results. single precision has about 7 significant digits; these bounds
+# leave room for error that accumulates over long filters and sums.
+SAMPLE_TOLERANCE = 1e-4
+SPECTRUM_TOLERANCE = 1e-4
+MIX_TOLERANCE = 1e-5
+
+
+def noisy_tone(n, seed=0):
+    '''Make a tone in uniform noise, with peaks near 0.8.'''
+    rng = numpy.random.RandomState(seed)
+    return 0.5 * numpy.sin(numpy.arange(n) * 0.01) + rng.uniform(-0.3, 0.3, n)
+
+
+class DtypeTestCase(unittest.TestCase):
+    def assertClose(self, expected, actual, tolerance):
+        expected = numpy.asarray(expected)
+        actual = numpy.asarray(actual)
+        self.assertEqual(expected.shape, actual.shape)
+        error = abs(expected - actual).max() / abs(expected).max()
+        self.assertLess(error, tolerance)
+
+
+class TestClip(DtypeTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root, 'tone.wav')
+        pcm = (noisy_tone(44100) * 32767).astype('<i2')
+        handle = wave.open(self.filename, 'wb')
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(44100)
+        handle.writeframes(pcm.tobytes())
+        handle.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def process(self, dtype):
+        clip = lmj.sound.Clip(self.filename, dtype=dtype)
+        self.assertEqual(clip.dtype, dtype)
+        yield 'load', clip.samples.copy()
+        clip.normalize()
+        yield 'normalize', clip.samples.copy()
+        clip.lowpass_filter(5000.)
+        yield 'filter', clip.samples.copy()
+        clip.set_sample_rate(22050)
+        yield 'resample', clip.samples.copy()
+        self.assertEqual(clip.dtype, dtype)
+
+    def test_processing(self):
+        expected = list(self.process(numpy.float64))
+        actual = list(self.process(numpy.float32))
+        for (step, e), (_, a) in zip(expected, actual):
+            self.assertEqual(a.dtype, numpy.float32, step)
+            self.assertClose(e, a, SAMPLE_TOLERANCE)
+
+    def test_load_clip(self):
+        expected = lmj.sound.load_clip(self.filename, 16000, True, dtype=numpy.float64)
+        actual = lmj.sound.load_clip(self.filename, 16000, True, dtype=numpy.float32)
+        self.assertEqual(actual.dtype, numpy.float32)
+        self.assertClose(expected.samples, actual.samples, SAMPLE_TOLERANCE)
+
+    def test_default_dtype(self):
+        previous = lmj.sound.set_default_dtype(numpy.float32)
+        try:
+            self.assertEqual(lmj.sound.Clip(self.filename).dtype, numpy.float32)
+        finally:
+            lmj.sound.set_default_dtype(previous)
+        self.assertRaises(ValueError, lmj.sound.set_default_dtype, int)
+
+
+class TestTransforms(DtypeTestCase):
+    def setUp(self):
+        self.samples = noisy_tone(20000)
+
+    def transform(self, dtype):
+        clip = lmj.sound.Clip(samples=self.samples, sample_rate=16000, dtype=dtype)
+        _, coeffs = clip.stft(512, 128, window_type='hann')
+        samples = lmj.sound.istft(coeffs, 128, 'hann', length=len(clip))
+        return coeffs, samples
+
+    def test_stft(self):
+        expected, _ = self.transform(numpy.float64)
+        actual, _ = self.transform(numpy.float32)
+        self.assertEqual(actual.dtype, numpy.complex64)
+        self.assertClose(expected, actual, SPECTRUM_TOLERANCE)
+
+    def test_istft(self):
+        _, expected = self.transform(numpy.float64)
+        _, actual = self.transform(numpy.float32)
+        self.assertEqual(actual.dtype, numpy.float32)
+        self.assertClose(expected, actual, SAMPLE_TOLERANCE)
+        self.assertClose(self.samples[512:-512], actual[512:-512], SAMPLE_TOLERANCE)
+
+
+class TestRepertoire(DtypeTestCase):
+    def setUp(self):
+        samples = noisy_tone(30000)
+        self.clips = [lmj.sound.Clip(samples=samples[i:i + 3000], sample_rate=8000)
+                      for i in range(0, len(samples), 3000)]
+
+    def test_mix(self):
+        controls = [((1, 0.5), (3, 1.2)), (), ((2, 0.7), )] * 10
+        expected = numpy.concatenate(list(
+            lmj.sound.Repertoire(self.clips).render(controls, 100.)))
+        actual = numpy.concatenate(list(
+            lmj.sound.Repertoire(self.clips, numpy.float32).render(controls, 100.)))
+        self.assertEqual(actual.dtype, numpy.float32)
+        self.assertClose(expected, actual, MIX_TOLERANCE)
+
+    def test_chain(self):
+        def chain(dtype):
+            numpy.random.seed(1)
+            rep = lmj.sound.Repertoire(self.clips, dtype)
+            return next(rep.chain_blocks(block_size=20000))
+        expected = chain(None)
+        actual = chain(numpy.float32)
+        self.assertEqual(actual.dtype, numpy.float32)
+        self.assertClose(expected, actual, MIX_TOLERANCE)
+
+    def test_mixed_types(self):
+        clips = [self.clips[0], self.clips[1].astype(numpy.float32)]
+        self.assertRaises(AssertionError, lmj.sound.Repertoire, clips)
+        rep = lmj.sound.Repertoire(clips, numpy.float32)
+        self.assertEqual([c.dtype for c in rep], [numpy.float32] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
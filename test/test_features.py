@@ -0,0 +1,66 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.features.'''
+
+import numpy
+import unittest
+
+from lmj.sound import features
+
+
+class TestFilterbank(unittest.TestCase):
+    def test_odd_width(self):
+        # 30ms frames at 22050Hz are 661 samples wide.
+        n_fft = 661
+        freqs = numpy.fft.rfftfreq(n_fft, 1. / 22050)
+        bank = features.filterbank(22050, n_fft, 20, 'linear')
+        self.assertEqual(bank.shape, (20, len(freqs)))
+        edges = numpy.linspace(0, 11025, 22)
+        expected = features._triangles(freqs, edges[:-2], edges[1:-1], edges[2:])
+        numpy.testing.assert_allclose(bank, expected, atol=1e-12)
+
+    def test_cached_per_width(self):
+        odd = features.filterbank(22050, 661, 20)
+        even = features.filterbank(22050, 660, 20)
+        self.assertIsNot(odd, even)
+        self.assertIs(odd, features.filterbank(22050, 661, 20))
+
+
+class TestSpectra(unittest.TestCase):
+    def test_tone(self):
+        n_fft, sample_rate = 661, 22050
+        t = numpy.arange(n_fft) / float(sample_rate)
+        freq = 100 * sample_rate / float(n_fft)
+        coeffs = numpy.fft.rfft(numpy.sin(2 * numpy.pi * freq * t))[None, :]
+        bands = features.band_spectrum(coeffs, sample_rate, n_fft, 20, 'linear')
+        centers = numpy.linspace(0, sample_rate / 2., 22)[1:-1]
+        self.assertEqual(bands.argmax(), abs(centers - freq).argmin())
+
+    def test_mismatched_width(self):
+        coeffs = numpy.zeros((3, 331), complex)
+        self.assertRaises(ValueError, features.mfcc, coeffs, 22050, 512)
+        self.assertEqual(features.mfcc(coeffs + 1, 22050, 661).shape, (3, 13))
+        self.assertEqual(features.cepstrum(coeffs + 1, 661).shape, (3, 661))
+
+
+if __name__ == '__main__':
+    unittest.main()
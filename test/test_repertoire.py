@@ -0,0 +1,78 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.Repertoire.'''
+
+import numpy
+import unittest
+
+import lmj.sound
+
+
+def constant(value, n):
+    return lmj.sound.Clip(samples=value * numpy.ones(n), sample_rate=8000)
+
+
+class TestChain(unittest.TestCase):
+    def chain(self, clips, size, seed=0, **kwargs):
+        numpy.random.seed(seed)
+        rep = lmj.sound.Repertoire(clips)
+        return next(rep.chain_blocks(block_size=size, **kwargs))
+
+    def test_short_target(self):
+        # a 1000-sample clip crossfades over its last 500 samples, but the
+        # 10-sample clips are too short to cover that.
+        clips = [constant(1., 1000), constant(2., 10), constant(3., 10)]
+        for fade in ('linear', 'equal-power'):
+            out = self.chain(clips, 5000, overlap=0.5, fade=fade)
+            self.assertEqual(out.shape, (5000, ))
+            self.assertTrue(numpy.isfinite(out).all())
+        # linear crossfades of constant clips stay between their levels.
+        out = self.chain(clips, 5000, overlap=0.5)
+        self.assertTrue(((out >= 1 - 1e-12) & (out <= 3 + 1e-12)).all())
+
+    def test_short_target_blend(self):
+        # with linear fades between constant clips, a shortened crossfade
+        # still moves monotonically from one level to the next.
+        clips = [constant(0., 100), constant(1., 4)]
+        numpy.random.seed(0)
+        rep = lmj.sound.Repertoire(clips)
+        segments = rep._chain_segments(0.5, 'linear')
+        lengths = []
+        for _ in range(50):
+            segment = next(segments)
+            lengths.append(len(segment))
+            self.assertTrue((numpy.diff(segment) >= -1e-12).all() or
+                            (numpy.diff(segment) <= 1e-12).all())
+        self.assertLessEqual(max(lengths), 100)
+
+    def test_matches_chain(self):
+        samples = numpy.random.RandomState(1).randn(3000)
+        clips = [lmj.sound.Clip(samples=samples[i:i + 300], sample_rate=8000)
+                 for i in range(0, 3000, 300)]
+        numpy.random.seed(3)
+        rep = lmj.sound.Repertoire(clips)
+        expected = numpy.array([s for _, s in zip(range(2000), rep.chain())])
+        numpy.testing.assert_allclose(self.chain(clips, 2000, seed=3), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
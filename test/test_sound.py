@@ -0,0 +1,95 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+'''Tests for lmj.sound.Clip.'''
+
+import numpy
+import unittest
+
+import lmj.sound
+
+
+def tone(seconds=2., sample_rate=8000, seed=0):
+    '''Make a clip holding a tone in a little uniform noise.'''
+    rng = numpy.random.RandomState(seed)
+    n = int(seconds * sample_rate)
+    samples = 0.5 * numpy.sin(numpy.arange(n) * 0.05) + rng.uniform(-0.1, 0.1, n)
+    return lmj.sound.Clip(samples=samples, sample_rate=sample_rate)
+
+
+class TestDefaultWindows(unittest.TestCase):
+    def test_stft(self):
+        clip = tone()
+        offsets, coeffs = clip.stft(512, 128)
+        self.assertEqual(coeffs.shape, (len(offsets), 257))
+        expected = numpy.fft.rfft(clip.get_window(512))
+        numpy.testing.assert_allclose(coeffs[0], expected, atol=1e-10)
+
+    def test_frames(self):
+        clip = tone()
+        offsets, frames = clip.frames(512, 128)
+        self.assertEqual(frames.shape, (len(offsets), 512))
+
+    def test_iterators(self):
+        clip = tone()
+        self.assertTrue(list(clip.iter_windows(512)))
+        self.assertTrue(list(clip.iter_fft_coeffs(512)))
+        self.assertTrue(list(clip.iter_log_power(512)))
+
+
+class TestIstft(unittest.TestCase):
+    def test_defaults(self):
+        clip = tone()
+        offsets, coeffs = clip.stft(512, 128)
+        samples = lmj.sound.istft(coeffs, 128)
+        self.assertEqual(len(samples), offsets[-1] + 512)
+        err = abs(samples - clip.samples[:len(samples)])[512:-512].max()
+        self.assertLess(err, 1e-10)
+
+    def test_length(self):
+        clip = tone()
+        _, coeffs = clip.stft(512, 128)
+        samples = lmj.sound.istft(coeffs, 128, length=len(clip))
+        self.assertEqual(samples.shape, clip.shape)
+
+
+class TestReconstructWithFFT(unittest.TestCase):
+    def test_identity(self):
+        clip = tone()
+        for window_type in ('hann', 'hamming'):
+            out = clip.reconstruct_with_fft(512, min_coeff=0., window_type=window_type)
+            self.assertEqual(out.shape, clip.shape)
+            err = abs(out.samples - clip.samples)[1024:-1024].max()
+            self.assertLess(err, 1e-10)
+
+    def test_threshold(self):
+        clip = tone()
+        out = clip.reconstruct_with_fft(512, min_coeff=1e6)
+        self.assertEqual(abs(out.samples).max(), 0)
+
+    def test_interval(self):
+        clip = tone()
+        out = clip.reconstruct_with_fft(512, interval=0.25, min_coeff=0.)
+        err = abs(out.samples - clip.samples)[1024:-1024].max()
+        self.assertLess(err, 1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
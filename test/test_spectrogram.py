@@ -0,0 +1,49 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.StreamingSpectrogram.'''
+
+import numpy
+import unittest
+
+import lmj.sound
+
+
+class TestStreamingSpectrogram(unittest.TestCase):
+    def test_defaults(self):
+        spec = lmj.sound.StreamingSpectrogram(256)
+        self.assertEqual(spec.hop, 128)
+        self.assertEqual(spec.magnitude.shape, (800, 129))
+
+    def test_matches_stft(self):
+        samples = numpy.random.RandomState(0).randn(5000)
+        clip = lmj.sound.Clip(samples=samples, sample_rate=8000)
+        _, coeffs = clip.stft(256, 128)
+        spec = lmj.sound.StreamingSpectrogram(256, history=100)
+        for i in range(0, len(samples), 700):
+            spec.push(samples[i:i + 700])
+        self.assertEqual(spec.frames, len(coeffs))
+        magnitude = spec.ordered(spec.magnitude)[-len(coeffs):]
+        numpy.testing.assert_allclose(magnitude, abs(coeffs), atol=1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Copyright (c) 2011 Leif Johnson <leif@leifjohnson.net>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+'''Tests for lmj.sound.voice.'''
+
+import itertools
+import numpy
+import unittest
+
+from lmj.sound import voice
+
+
+class TestVoice(unittest.TestCase):
+    def test_defaults(self):
+        v = voice.Voice()
+        self.assertEqual(v.samples, 241)
+        self.assertEqual(len(v.window), 480)
+
+    def test_render(self):
+        numpy.random.seed(0)
+        v = voice.Voice()
+        frames = list(itertools.islice(v.generate(), 50))
+        samples = v.render(frames)
+        self.assertEqual(samples.shape, (49 * 240, ))
+        self.assertTrue(numpy.isfinite(samples).all())
+        blocks = numpy.concatenate(list(v.iterblocks(frames, block_frames=7)))
+        numpy.testing.assert_allclose(blocks, samples, atol=1e-12)
+
+    def test_trajectories(self):
+        numpy.random.seed(0)
+        v = voice.Voice()
+        bandwidths, formants = v.generate_trajectories(30, n_voices=2)
+        self.assertEqual(bandwidths.shape, (2, 30))
+        self.assertEqual(formants.shape, (2, 30, 4, 3))
+        samples = v.synthesize(bandwidths[0], formants[0])
+        self.assertEqual(samples.shape, (29 * 240, ))
+
+
+if __name__ == '__main__':
+    unittest.main()